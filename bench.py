@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+bench.py - Çevrimdışı benchmark'lar (ffmpeg ile üretilen sentetik medya)
+- render: trim_video + merge_audio_video (iki adım) ile render_video (tek geçiş)
+          karşılaştırması; süre ve en yüksek disk kullanımı
+- download: yerel Range sunucusuna karşı bağlantı sayısına göre indirme hızı ve
+            koparma / iptal sonrası devam etme
+- profiles: render profilleri (draft / standard / archive) × sentetik klipler;
+            encode fps, çıktı boyutu ve tahmin modelinin kalibrasyonu
+- pipeline: tts.py + fragman.py uçtan uca (worker.py batch ile), TMDB / RapidAPI /
+            dosya sunucusu / TTS / callback yerine fakes.py; aşama bazında süre ve
+            throughput trace dosyalarından raporlanır. --warm ile ikinci tur cache'li
+
+Kullanım:
+    python bench.py render --video-seconds 150 --audio-seconds 60 --modes copy,encode
+    python bench.py download --size-mb 64 --rate-mb 5 --segments 1,2,4,8 --drop-rate 0.2
+    python bench.py profiles --seconds 30 --clips 1280x720@30,1920x1080@60 --budget 20
+    python bench.py pipeline --films 4 --concurrency 2 --ready-after 5 --fail-rate 0.05 --warm
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+import downloader
+import fakes
+import fragman
+
+# ============================================
+# SENTETİK MEDYA
+# ============================================
+
+VIDEO_CODECS = {
+    # RapidAPI quality=247 → VP9 720p (webm); h264 de denenebilir
+    "vp9": ["-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8", "-b:v", "2M", "-g", "120"],
+    "h264": ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-g", "120"],
+}
+
+
+def make_video(path, seconds, codec="vp9", size="1280x720", fps=30):
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={fps}:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+        *VIDEO_CODECS[codec],
+        "-c:a", "aac", "-b:a", "128k",
+        path
+    ], check=True)
+    return path
+
+
+def make_audio(path, seconds):
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=24000:duration={seconds}",
+        "-ac", "1", "-b:a", "192k",
+        path
+    ], check=True)
+    return path
+
+
+def size_of(*paths):
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+# ============================================
+# RENDER BENCHMARK
+# ============================================
+
+def bench_render(workdir, raw, audio, duration, mode):
+    trimmed = os.path.join(workdir, f"trimmed_{mode}.mp4")
+    two_step = os.path.join(workdir, f"final2_{mode}.mp4")
+    fused = os.path.join(workdir, f"final1_{mode}.mp4")
+
+    started = time.monotonic()
+    ok = fragman.trim_video(raw, duration, trimmed, mode=mode)
+    ok = ok and fragman.merge_audio_video(trimmed, audio, two_step)
+    two_step_time = time.monotonic() - started
+    # raw + ses + trimmed + final aynı anda diskte
+    two_step_peak = size_of(raw, audio, trimmed, two_step)
+
+    started = time.monotonic()
+    ok = fragman.render_video(raw, audio, duration, fused, mode=mode) and ok
+    fused_time = time.monotonic() - started
+    fused_peak = size_of(raw, audio, fused)
+
+    for path in (trimmed, two_step, fused):
+        if os.path.exists(path):
+            os.remove(path)
+
+    return {
+        "mode": mode,
+        "ok": bool(ok),
+        "two_step_sec": round(two_step_time, 2),
+        "fused_sec": round(fused_time, 2),
+        "two_step_peak_mb": round(two_step_peak / 1024 / 1024, 1),
+        "fused_peak_mb": round(fused_peak / 1024 / 1024, 1),
+    }
+
+
+def cmd_render(args):
+    workdir = tempfile.mkdtemp(prefix="bench_render_")
+
+    try:
+        print(f"🧪 Sentetik medya üretiliyor ({args.codec}, {args.video_seconds} sn video)...")
+        raw = make_video(os.path.join(workdir, "raw.mp4"), args.video_seconds, args.codec)
+        audio = make_audio(os.path.join(workdir, "audio.mp3"), args.audio_seconds)
+
+        rows = [bench_render(workdir, raw, audio, args.audio_seconds, mode) for mode in args.modes.split(",")]
+
+        print(f"{'mod':<8} {'2 adım sn':>10} {'tek geçiş sn':>13} {'2 adım MB':>10} {'tek geçiş MB':>13}")
+        for row in rows:
+            print(f"{row['mode']:<8} {row['two_step_sec']:>10} {row['fused_sec']:>13} "
+                  f"{row['two_step_peak_mb']:>10} {row['fused_peak_mb']:>13}" + ("" if row["ok"] else "  ❌"))
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=2)
+
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ============================================
+# DOWNLOAD BENCHMARK
+# ============================================
+
+def verify_download(path, size):
+    # Sentetik dosya içeriği offset'ten hesaplanır; blok blok karşılaştır
+    with open(path, "rb") as f:
+        position = 0
+        while position < size:
+            block = f.read(4 * 1024 * 1024)
+            if not block or block != fakes.file_bytes(position, position + len(block) - 1):
+                return False
+            position += len(block)
+    return position == size
+
+
+def cmd_download(args):
+    workdir = tempfile.mkdtemp(prefix="bench_download_")
+    size = args.size_mb * 1024 * 1024
+    server = fakes.start("files", rate=int(args.rate_mb * 1024 * 1024), drop_rate=args.drop_rate)
+    url = f"{server.url}/file/{size}"
+    output = os.path.join(workdir, "trailer.mp4")
+    rows = []
+    quiet = lambda message: None
+
+    try:
+        for segments in [int(n) for n in args.segments.split(",")]:
+            started = time.monotonic()
+            ok = downloader.download(url, output, segments=segments, retries=50, log=quiet)
+            elapsed = time.monotonic() - started
+            ok = ok and verify_download(output, size)
+            rows.append({"segments": segments, "ok": ok, "sec": round(elapsed, 2),
+                         "mb_s": round(args.size_mb / elapsed, 1)})
+            os.remove(output)
+
+        # Yarıda iptal → aynı komutla devam; ikinci çağrı sadece kalan kısmı indirir
+        cancel = threading.Event()
+        threading.Timer(args.cancel_after, cancel.set).start()
+        downloader.download(url, output, segments=4, cancel=cancel, retries=50, log=quiet)
+
+        started = time.monotonic()
+        state = downloader._load_state(f"{output}.part.json", size, f'"fake-{size}"') or {"ranges": []}
+        resumed = sum(r[2] for r in state["ranges"])
+        ok = downloader.download(url, output, segments=4, retries=50, log=quiet) and verify_download(output, size)
+        resume = {"ok": ok, "resumed_mb": round(resumed / 1024 / 1024, 1),
+                  "sec": round(time.monotonic() - started, 2)}
+
+        print(f"{'bağlantı':>8} {'sn':>8} {'MB/s':>8}")
+        for row in rows:
+            print(f"{row['segments']:>8} {row['sec']:>8} {row['mb_s']:>8}" + ("" if row["ok"] else "  ❌"))
+        print(f"♻️ Devam: {resume['resumed_mb']} MB hazırdı, kalan {resume['sec']} sn"
+              + ("" if resume["ok"] else "  ❌"))
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"segments": rows, "resume": resume}, f, indent=2)
+
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ============================================
+# PIPELINE BENCHMARK (UÇTAN UCA, SAHTE SERVİSLER)
+# ============================================
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE_SENTENCES = [
+    "Film, küçük bir kasabada geçen sıradan bir günün ardından beklenmedik bir olayla açılıyor.",
+    "Yönetmen, karakterlerin iç dünyasını uzun planlar ve sessiz anlarla anlatmayı tercih etmiş.",
+    "Görüntü yönetimi özellikle gece sahnelerinde dikkat çekici bir atmosfer yaratıyor.",
+    "Senaryonun ikinci yarısı ise tempo açısından zaman zaman aksıyor.",
+    "Yine de oyuncuların performansı hikâyeyi sonuna kadar taşımayı başarıyor.",
+]
+
+
+def sample_text(chars):
+    sentences = []
+    while sum(len(s) + 1 for s in sentences) < chars:
+        sentences.append(SAMPLE_SENTENCES[len(sentences) % len(SAMPLE_SENTENCES)])
+    return " ".join(sentences)
+
+
+def write_jobs(path, films, text, ses_url, callback):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(1, films + 1):
+            f.write(json.dumps({"kind": "tts", "payload": {
+                "film_id": i, "text": text, "callback": callback}}, ensure_ascii=False) + "\n")
+            f.write(json.dumps({"kind": "fragman", "payload": {
+                "film_id": i, "tmdb_id": 1000 + i, "film_adi": f"Film {i}",
+                "ses_url": ses_url, "callback": callback}}, ensure_ascii=False) + "\n")
+
+
+def read_traces(directory):
+    traces = []
+    for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        if name.endswith(".json") and not name.endswith(".chrome.json"):
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                traces.append(json.load(f))
+    return traces
+
+
+def stage_report(traces):
+    # iş türü → aşama → {ortalama süre, toplam byte, MB/s, çocuk CPU}
+    report = {}
+    for trace in traces:
+        for name, t in trace["summary"].items():
+            row = report.setdefault(trace["job"], {}).setdefault(name, {"runs": 0, "wall": 0.0, "bytes": 0, "cpu": 0.0})
+            row["runs"] += 1
+            row["wall"] += t["wall"]
+            row["bytes"] += t["bytes"]
+            row["cpu"] += t["child_cpu"]
+
+    for stages in report.values():
+        for row in stages.values():
+            row["mb_s"] = round(row["bytes"] / 1024 / 1024 / row["wall"], 1) if row["wall"] and row["bytes"] else None
+            row["wall"] = round(row["wall"] / row["runs"], 2)
+            row["cpu"] = round(row["cpu"] / row["runs"], 2)
+    return report
+
+
+def run_pipeline_round(workdir, label, jobs, env, concurrency, verbose):
+    trace_dir = os.path.join(workdir, f"traces_{label}")
+    manifest = os.path.join(workdir, f"results_{label}.jsonl")
+    log_path = os.path.join(workdir, f"{label}.log")
+
+    started = time.monotonic()
+    with open(log_path, "w", encoding="utf-8") as log:
+        subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, "worker.py"), "batch", jobs,
+             "--manifest", manifest, "--concurrency", str(concurrency)],
+            cwd=workdir, env={**env, "TRACE_DIR": trace_dir},
+            stdout=None if verbose else log, stderr=subprocess.STDOUT
+        )
+    wall = time.monotonic() - started
+
+    with open(manifest, "r", encoding="utf-8") as f:
+        results = [json.loads(line) for line in f if line.strip()]
+
+    return {
+        "label": label,
+        "wall": round(wall, 2),
+        "jobs": len(results),
+        "ok": sum(1 for r in results if r["ok"]),
+        "films_per_min": round(sum(1 for r in results if r["ok"] and r["kind"] == "fragman") / wall * 60, 2),
+        "stages": stage_report(read_traces(trace_dir)),
+        "errors": [r["error"] for r in results if not r["ok"]][:5],
+        "log": log_path,
+    }
+
+
+def print_round(result):
+    print(f"\n🧪 {result['label']}: {result['ok']}/{result['jobs']} iş başarılı, {result['wall']} sn, "
+          f"{result['films_per_min']} film/dk")
+    print(f"   {'iş':<8} {'aşama':<11} {'adet':>5} {'ort sn':>8} {'cpu sn':>8} {'MB/s':>7}")
+    for kind, stages in sorted(result["stages"].items()):
+        for name, row in sorted(stages.items(), key=lambda item: -item[1]["wall"]):
+            print(f"   {kind:<8} {name:<11} {row['runs']:>5} {row['wall']:>8} {row['cpu']:>8} "
+                  f"{row['mb_s'] if row['mb_s'] is not None else '-':>7}")
+    for error in result["errors"]:
+        print(f"   ❌ {error}")
+
+
+def cmd_pipeline(args):
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    servers = []
+
+    try:
+        print(f"🧪 Sentetik medya üretiliyor ({args.codec}, {args.video_seconds} sn video)...")
+        trailer = make_video(os.path.join(workdir, "trailer.mp4"), args.video_seconds, args.codec)
+        narration = make_audio(os.path.join(workdir, "narration.mp3"), args.audio_seconds)
+
+        def start(kind, **options):
+            server = fakes.start(kind, latency=args.latency, fail_rate=args.fail_rate, **options)
+            servers.append(server)
+            return server
+
+        tts = start("tts")
+        callback = start("callback")
+        tmdb = start("tmdb")
+        rapidapi = start("rapidapi", ready_after=args.ready_after, rate=int(args.rate_mb * 1024 * 1024))
+        rapidapi.state["media"] = trailer
+        files = fakes.start("files")
+        files.state["static"] = {"narration.mp3": narration}
+        servers.append(files)
+
+        jobs = os.path.join(workdir, "jobs.jsonl")
+        write_jobs(jobs, args.films, sample_text(args.text_chars), f"{files.url}/static/narration.mp3", f"{callback.url}/")
+
+        env = {
+            **os.environ,
+            "PYTHONIOENCODING": "utf-8",
+            "TTS_ENDPOINT": f"{tts.url}/",
+            "TMDB_API_KEY": "fake",
+            "TMDB_API_BASE": tmdb.url,
+            "RAPIDAPI_KEYS": "fake-key-1,fake-key-2,fake-key-3",
+            "RAPIDAPI_BASE": rapidapi.url,
+            "WORKER_MAX_ATTEMPTS": "1",
+        }
+
+        # cold: boş cache'ler; warm: aynı çalışma klasörü, TTS / TMDB / fragman cache'leri dolu
+        rounds = [run_pipeline_round(workdir, "cold", jobs, env, args.concurrency, args.verbose)]
+        if args.warm:
+            rounds.append(run_pipeline_round(workdir, "warm", jobs, env, args.concurrency, args.verbose))
+
+        for result in rounds:
+            print_round(result)
+
+        uploads = callback.state.get("uploads", [])
+        print(f"\n📡 Callback: {len(uploads)} yükleme, {sum(u['bytes'] for u in uploads)/1024/1024:.1f} MB | "
+              f"RapidAPI key kullanımı: {rapidapi.state.get('keys', {})}")
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(rounds, f, indent=2, ensure_ascii=False)
+
+        if args.keep:
+            print(f"📂 Çalışma klasörü: {workdir}")
+
+    finally:
+        for server in servers:
+            server.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ============================================
+# PROFİL BENCHMARK
+# ============================================
+
+def bench_profile(workdir, raw, seconds, clip, profile, budget):
+    output = os.path.join(workdir, f"{clip}_{profile}.mp4")
+    stream = fragman.probe_video_stream(raw)
+    if stream is None:
+        raise RuntimeError(f"Sentetik klip okunamadı: {raw}")
+    settings = fragman.render_settings(seconds, *stream, profile, budget)
+
+    started = time.monotonic()
+    ok = fragman.trim_video(raw, seconds, output, mode="encode", profile=profile, budget=budget)
+    elapsed = time.monotonic() - started
+    size = size_of(output)
+
+    if os.path.exists(output):
+        os.remove(output)
+
+    return {
+        "clip": clip,
+        "profile": profile,
+        "ok": bool(ok),
+        "preset": settings["preset"],
+        "crf": settings["crf"],
+        "resolution": f"{settings['width']}x{settings['height']}",
+        "fps": settings["fps"],
+        "threads": settings["threads"],
+        "sec": round(elapsed, 2),
+        "encode_fps": round(seconds * settings["fps"] / elapsed, 1),
+        "size_mb": round(size / 1024 / 1024, 2),
+        "estimated_sec": settings["estimated_sec"],
+        # Tahmin modeli doğruysa RENDER_BASE_FPS bu olmalıydı
+        "implied_base_fps": round(fragman.RENDER_BASE_FPS * settings["estimated_sec"] / elapsed, 1),
+    }
+
+
+def cmd_profiles(args):
+    workdir = tempfile.mkdtemp(prefix="bench_profiles_")
+    profiles = args.profiles.split(",")
+    rows = []
+
+    try:
+        for clip in args.clips.split(","):
+            size, _, fps = clip.partition("@")
+            print(f"🧪 Sentetik klip: {size} @ {fps or 30} fps, {args.seconds} sn ({args.codec})")
+            raw = make_video(os.path.join(workdir, f"{clip}.mp4"), args.seconds, args.codec, size, int(fps or 30))
+
+            for profile in profiles:
+                rows.append(bench_profile(workdir, raw, args.seconds, clip, profile, args.budget))
+
+            os.remove(raw)
+
+        print(f"{'klip':<16} {'profil':<9} {'preset':<10} {'crf':>3} {'çıkış':>10} {'thr':>4} "
+              f"{'sn':>7} {'tahmin':>7} {'enc fps':>8} {'MB':>7}")
+        for row in rows:
+            print(f"{row['clip']:<16} {row['profile']:<9} {row['preset']:<10} {row['crf']:>3} "
+                  f"{row['resolution']:>10} {row['threads']:>4} {row['sec']:>7} {row['estimated_sec']:>7} "
+                  f"{row['encode_fps']:>8} {row['size_mb']:>7}" + ("" if row["ok"] else "  ❌"))
+
+        implied = sorted(row["implied_base_fps"] for row in rows if row["ok"])
+        if implied:
+            print(f"📐 Bu makine için RENDER_BASE_FPS ≈ {implied[len(implied) // 2]} "
+                  f"(şu an {fragman.RENDER_BASE_FPS:g})")
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=2)
+
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Çevrimdışı benchmark'lar")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    render = sub.add_parser("render", help="iki adım vs tek geçiş render")
+    render.add_argument("--video-seconds", type=int, default=150)
+    render.add_argument("--audio-seconds", type=int, default=60)
+    render.add_argument("--codec", choices=sorted(VIDEO_CODECS), default="vp9")
+    render.add_argument("--modes", default="copy,exact,encode")
+    render.add_argument("--json", help="sonuçları JSON dosyasına yaz")
+    render.set_defaults(func=cmd_render)
+
+    download = sub.add_parser("download", help="Range indirme: bağlantı sayısı + devam etme")
+    download.add_argument("--size-mb", type=int, default=64)
+    download.add_argument("--rate-mb", type=float, default=5.0, help="bağlantı başı hız limiti (MB/s)")
+    download.add_argument("--segments", default="1,2,4,8")
+    download.add_argument("--drop-rate", type=float, default=0.0)
+    download.add_argument("--cancel-after", type=float, default=2.0, help="devam testi için iptal (sn)")
+    download.add_argument("--json", help="sonuçları JSON dosyasına yaz")
+    download.set_defaults(func=cmd_download)
+
+    pipeline = sub.add_parser("pipeline", help="tts + fragman uçtan uca, sahte servislerle")
+    pipeline.add_argument("--films", type=int, default=2)
+    pipeline.add_argument("--concurrency", type=int, default=2, help="worker.py batch eşzamanlılığı")
+    pipeline.add_argument("--text-chars", type=int, default=3000)
+    pipeline.add_argument("--video-seconds", type=int, default=150)
+    pipeline.add_argument("--audio-seconds", type=int, default=60)
+    pipeline.add_argument("--codec", choices=sorted(VIDEO_CODECS), default="vp9")
+    pipeline.add_argument("--latency", type=float, default=0.05, help="sahte servis gecikmesi (sn)")
+    pipeline.add_argument("--fail-rate", type=float, default=0.0)
+    pipeline.add_argument("--ready-after", type=float, default=5.0, help="RapidAPI linki kaç sn sonra hazır")
+    pipeline.add_argument("--rate-mb", type=float, default=0.0, help="dosya sunucusu bağlantı başı MB/s (0 = limitsiz)")
+    pipeline.add_argument("--warm", action="store_true", help="aynı cache'lerle ikinci tur")
+    pipeline.add_argument("--verbose", action="store_true", help="iş loglarını ekrana bas")
+    pipeline.add_argument("--keep", action="store_true", help="çalışma klasörünü silme")
+    pipeline.add_argument("--json", help="sonuçları JSON dosyasına yaz")
+    pipeline.set_defaults(func=cmd_pipeline)
+
+    profiles = sub.add_parser("profiles", help="render profilleri: encode fps + çıktı boyutu matrisi")
+    profiles.add_argument("--seconds", type=int, default=30, help="klip (ve encode) süresi")
+    profiles.add_argument("--clips", default="1280x720@30,1920x1080@30,1920x1080@60")
+    profiles.add_argument("--codec", choices=sorted(VIDEO_CODECS), default="vp9")
+    profiles.add_argument("--profiles", default=",".join(fragman.RENDER_PROFILES))
+    profiles.add_argument("--budget", type=float, default=None, help="encode süre sınırı (sn)")
+    profiles.add_argument("--json", help="sonuçları JSON dosyasına yaz")
+    profiles.set_defaults(func=cmd_profiles)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+cache.py - Disk üzerinde cache'ler
+- DiskCache: içerik cache'i (boyut limitli, LRU temizlikli)
+  - Anahtar: çağıranın ürettiği hash (örn. metin + ses ayarları)
+  - LRU: her okumada dosyanın mtime'ı güncellenir, limit aşılınca en eskiler silinir
+  - Yazma atomik (tmp + os.replace), aynı cache'i birden fazla süreç kullanabilir
+  - put_file: büyük dosyalar belleğe alınmaz (mümkünse hardlink); yanında
+    <dosya>.sha256 tutulur, lookup(verify=True) boyut + hash kontrolü yapar
+- TTLCache: SQLite üzerinde küçük JSON kayıtlar (örn. API cevapları), kayıt başı TTL
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+
+def make_key(*parts):
+    # Sıralı, JSON ile ayrıştırılmış parçaların sha256'sı
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+DIGEST_SUFFIX = ".sha256"
+
+
+def file_digest(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DiskCache:
+
+    def __init__(self, root, max_bytes, suffix=""):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        # 256 alt klasöre dağıt, tek klasörde binlerce dosya olmasın
+        return os.path.join(self.root, key[:2], key + self.suffix)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, key, verify=False):
+        # Varsa dosya yolunu döner (LRU için dokunur), yoksa None
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            self._count(False)
+            return None
+
+        if verify and not self.verify(path):
+            self._remove(path)
+            self._count(False)
+            return None
+
+        self._count(True)
+        return path
+
+    def verify(self, path):
+        # put_file'ın yazdığı "<sha256> <boyut>" ile karşılaştır
+        try:
+            with open(path + DIGEST_SUFFIX, "r", encoding="utf-8") as f:
+                digest, size = f.read().split()
+            if os.path.getsize(path) != int(size):
+                return False
+            return file_digest(path) == digest
+        except (OSError, ValueError):
+            return False
+
+    def get(self, key):
+        path = self.lookup(key)
+        if not path:
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, data, evict=True):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        if evict:
+            self.evict()
+        return path
+
+    def put_file(self, key, src, evict=True):
+        # Dosyayı cache'e alır (aynı disk ise hardlink, değilse kopya) + hash yan dosyası
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            os.remove(tmp)
+            try:
+                os.link(src, tmp)
+            except OSError:
+                shutil.copyfile(src, tmp)
+
+            digest = f"{file_digest(tmp)} {os.path.getsize(tmp)}\n"
+            with open(tmp + DIGEST_SUFFIX, "w", encoding="utf-8") as f:
+                f.write(digest)
+
+            os.replace(tmp, path)
+            os.replace(tmp + DIGEST_SUFFIX, path + DIGEST_SUFFIX)
+        except BaseException:
+            for leftover in (tmp, tmp + DIGEST_SUFFIX):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+
+        if evict:
+            self.evict()
+        return path
+
+    def _remove(self, path):
+        for victim in (path, path + DIGEST_SUFFIX):
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+
+    def entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".tmp") or name.endswith(DIGEST_SUFFIX):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield st.st_mtime, st.st_size, path
+
+    def evict(self):
+        # Limit aşıldıysa en uzun süredir kullanılmayanları sil
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+
+        return removed
+
+
+class TTLCache:
+    """
+    anahtar → JSON değer, her kaydın kendi son kullanma zamanı var.
+    Her işlem kendi bağlantısını açar; thread'ler ve süreçler arasında güvenli.
+    """
+
+    def __init__(self, path, table="entries"):
+        self.path = path
+        self.table = table
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                       "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        # commit / rollback + bağlantıyı kapat
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, key):
+        # Süresi geçmemiş değeri döner, yoksa None
+        with self._connect() as db:
+            row = db.execute(f"SELECT value FROM {self.table} WHERE key = ? AND expires > ?",
+                             (key, time.time())).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, value, ttl):
+        with self._connect() as db:
+            db.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, expires) VALUES (?, ?, ?)",
+                       (key, json.dumps(value, ensure_ascii=False), time.time() + ttl))
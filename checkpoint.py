@@ -0,0 +1,129 @@
+"""
+checkpoint.py - Aşama checkpoint'leri (yeniden denenen iş kaldığı yerden devam eder)
+- İş başına klasör: CHECKPOINT_DIR/<iş>_<id>/ ; ara dosyalar da burada tutulur
+- manifest.json: girdi hash'i + biten aşamaların sonucu, anahtarı ve çıktı
+  dosyalarının boyut / sha256'sı
+- Girdi hash'i değiştiyse (farklı ses, metin, ayar) klasör sıfırlanır
+- Aşama ancak anahtarı tutar ve dosyaları doğrulanırsa atlanır; eksik / bozuk dosya
+  = aşama yeniden koşar
+- İş başarıyla bitince klasör silinir; yarım kalanlar CHECKPOINT_MAX_AGE sonra temizlenir
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from cache import file_digest, make_key
+
+CHECKPOINT_DIR     = os.environ.get("CHECKPOINT_DIR", os.path.join(".cache", "checkpoints"))
+CHECKPOINT_MAX_AGE = float(os.environ.get("CHECKPOINT_MAX_AGE", 3 * 24 * 3600))
+
+MANIFEST = "manifest.json"
+
+
+def purge(root=CHECKPOINT_DIR, max_age=CHECKPOINT_MAX_AGE):
+    # Uzun süredir dokunulmamış (muhtemelen vazgeçilmiş) iş klasörlerini siler
+    removed = 0
+    cutoff = time.time() - max_age
+
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return 0
+
+    for name in names:
+        path = os.path.join(root, name)
+        try:
+            manifest = os.path.join(path, MANIFEST)
+            touched = os.path.getmtime(manifest if os.path.exists(manifest) else path)
+        except OSError:
+            continue
+        if touched < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+
+    return removed
+
+
+class Checkpoint:
+
+    def __init__(self, job, job_id, inputs, root=CHECKPOINT_DIR):
+        self.dir = os.path.join(root, f"{job}_{job_id}")
+        self.manifest = os.path.join(self.dir, MANIFEST)
+        self.input_hash = make_key(job, inputs)
+        self._lock = threading.Lock()
+
+        purge(root)
+        self.stages = self._load()
+        self.resumed = bool(self.stages)
+
+    def _load(self):
+        try:
+            with open(self.manifest, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+
+        if data and data.get("input_hash") == self.input_hash:
+            return data.get("stages", {})
+
+        # Girdi değişmiş ya da manifest bozuk: eski ara dosyalar da geçersiz
+        shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.dir, exist_ok=True)
+        return {}
+
+    def _save(self):
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"input_hash": self.input_hash, "stages": self.stages}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.manifest)
+
+    def path(self, name):
+        # Ara dosyalar checkpoint klasöründe: temizlikte silinmez, sonraki denemede bulunur
+        return os.path.join(self.dir, name)
+
+    def lookup(self, stage, key=None):
+        """
+        Aşama daha önce bitmiş ve geçerliyse kaydı ({"result", "files", ...}), değilse None.
+        key: aşamanın girdilerinden türetilen değer; kaydedilenle aynı olmalı.
+        """
+        entry = self.stages.get(stage)
+        if entry is None:
+            return None
+
+        if entry["key"] != make_key(key):
+            return None
+
+        if entry.get("expires") and entry["expires"] < time.time():
+            return None
+
+        for path, meta in entry["files"].items():
+            try:
+                if os.path.getsize(path) != meta["size"] or file_digest(path) != meta["sha256"]:
+                    return None
+            except OSError:
+                return None
+
+        return entry
+
+    def done(self, stage, result, files=(), key=None, ttl=None):
+        # Sonuç JSON'a yazılabilir olmalı; dosyalar boyut + sha256 ile kaydedilir
+        entry = {
+            "result": result,
+            "key": make_key(key),
+            "files": {path: {"size": os.path.getsize(path), "sha256": file_digest(path)} for path in files},
+            "finished_at": time.time(),
+            "expires": time.time() + ttl if ttl else None,
+        }
+
+        with self._lock:
+            self.stages[stage] = entry
+            self._save()
+
+    def clear(self):
+        # İş bitti: ara dosyalarla birlikte sil
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.stages = {}
@@ -0,0 +1,229 @@
+"""
+downloader.py - HTTP Range ile çok bağlantılı, devam ettirilebilir indirme
+- Sunucu Range destekliyorsa dosya N parçaya bölünür, parçalar paralel indirilir
+- İlerleme <çıktı>.part + <çıktı>.part.json içinde tutulur; hata / iptal sonrası
+  aynı dosya (boyut + ETag/Last-Modified) için kaldığı yerden devam eder
+- Bitince boyut Content-Length ile doğrulanır, sonra .part → çıktı
+"""
+
+import json
+import os
+import threading
+import time
+
+import requests
+
+from retry import backoff
+
+DOWNLOAD_SEGMENTS   = max(1, int(os.environ.get("DOWNLOAD_SEGMENTS", "4")))
+DOWNLOAD_RETRIES    = max(1, int(os.environ.get("DOWNLOAD_RETRIES", "5")))
+MIN_SEGMENT_BYTES   = 4 * 1024 * 1024
+BLOCK_SIZE          = 256 * 1024
+STATE_SAVE_INTERVAL = 2.0
+
+
+class DownloadError(Exception):
+    pass
+
+
+def probe(session, url, timeout=30):
+    # "Range: bytes=0-0" → 206 ise Range destekli; (boyut, doğrulayıcı, ranged) döner
+    with session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=timeout) as res:
+        res.raise_for_status()
+        validator = res.headers.get("ETag") or res.headers.get("Last-Modified") or ""
+
+        if res.status_code == 206:
+            total = res.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit():
+                return int(total), validator, True
+
+        length = res.headers.get("Content-Length")
+        return (int(length) if length and res.status_code == 200 else None), validator, False
+
+
+def split_ranges(size, segments):
+    segments = max(1, min(segments, size // MIN_SEGMENT_BYTES or 1))
+    step = -(-size // segments)
+    return [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]
+
+
+def _load_state(path, size, validator):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if state.get("size") != size or state.get("validator") != validator:
+        return None
+    return state
+
+
+class _Progress:
+
+    def __init__(self, state, state_path, log):
+        self.state = state
+        self.state_path = state_path
+        self.log = log
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.resumed = self.done()
+        self.last_save = 0.0
+
+    def done(self):
+        return sum(r[2] for r in self.state["ranges"])
+
+    def add(self, index, nbytes):
+        with self.lock:
+            self.state["ranges"][index][2] += nbytes
+            now = time.monotonic()
+            if now - self.last_save >= STATE_SAVE_INTERVAL:
+                self.last_save = now
+                self.save()
+                self.report()
+
+    def save(self):
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_path)
+
+    def report(self):
+        done = self.done()
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        speed = (done - self.resumed) / 1024 / 1024 / elapsed
+        self.log(f"📊 İlerleme: {done / self.state['size'] * 100:.1f}% "
+                 f"({done/1024/1024:.1f} MB, {speed:.1f} MB/s, {len(self.state['ranges'])} bağlantı)")
+
+
+def _fetch_range(session, url, fd, index, progress, cancel, retries, timeout, log):
+    start, end, _ = progress.state["ranges"][index]
+    failures = 0
+
+    while True:
+        position = start + progress.state["ranges"][index][2]
+        if position > end or (cancel is not None and cancel.is_set()):
+            return
+
+        try:
+            headers = {"Range": f"bytes={position}-{end}"}
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as res:
+                if res.status_code != 206:
+                    raise DownloadError(f"Range desteklenmedi: HTTP {res.status_code}")
+
+                for block in res.iter_content(chunk_size=BLOCK_SIZE):
+                    if cancel is not None and cancel.is_set():
+                        return
+                    if not block:
+                        continue
+
+                    block = block[:end - position + 1]
+                    os.pwrite(fd, block, position)
+                    position += len(block)
+                    progress.add(index, len(block))
+                    failures = 0
+
+        except DownloadError:
+            raise
+        except (requests.RequestException, OSError) as e:
+            failures += 1
+            if failures >= retries:
+                raise DownloadError(f"Parça {index} {retries} denemede inmedi: {e}")
+            log(f"⚠️ Parça {index} koptu ({position - start} byte'ta), tekrar bağlanılıyor: {str(e)[:120]}")
+            time.sleep(backoff(failures))
+
+
+def _download_ranged(session, url, output, size, validator, segments, cancel, retries, timeout, log):
+    part = f"{output}.part"
+    state_path = f"{output}.part.json"
+
+    state = _load_state(state_path, size, validator) if os.path.exists(part) else None
+    if state is None:
+        state = {"size": size, "validator": validator, "ranges": split_ranges(size, segments)}
+        with open(part, "wb") as f:
+            f.truncate(size)
+
+    progress = _Progress(state, state_path, log)
+    if progress.resumed:
+        log(f"♻️ İndirme {progress.resumed/1024/1024:.1f} MB'tan devam ediyor")
+
+    errors = []
+    fd = os.open(part, os.O_RDWR)
+
+    def worker(index):
+        try:
+            _fetch_range(session, url, fd, index, progress, cancel, retries, timeout, log)
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        threads = [
+            threading.Thread(target=worker, args=(i,), daemon=True)
+            for i, (start, end, done) in enumerate(state["ranges"])
+            if start + done <= end
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        os.close(fd)
+        progress.save()
+
+    if cancel is not None and cancel.is_set():
+        log("🛑 İndirme iptal edildi (.part saklandı, devam ettirilebilir)")
+        return False
+
+    if errors:
+        raise errors[0]
+
+    actual = os.path.getsize(part)
+    if progress.done() != size or actual != size:
+        raise DownloadError(f"Boyut uyuşmuyor: {progress.done()} / {actual} / beklenen {size}")
+
+    progress.report()
+    os.replace(part, output)
+    os.remove(state_path)
+    return True
+
+
+def _download_single(session, url, output, size, cancel, timeout, log):
+    # Range yok: tek akış, devam ettirme mümkün değil
+    part = f"{output}.part"
+    written = 0
+    started = time.monotonic()
+
+    with session.get(url, stream=True, timeout=timeout) as res:
+        res.raise_for_status()
+
+        with open(part, "wb") as f:
+            for block in res.iter_content(chunk_size=BLOCK_SIZE):
+                if cancel is not None and cancel.is_set():
+                    log("🛑 İndirme iptal edildi")
+                    return False
+                if block:
+                    f.write(block)
+                    written += len(block)
+
+    if size is not None and written != size:
+        raise DownloadError(f"Boyut uyuşmuyor: {written} / beklenen {size}")
+
+    elapsed = max(time.monotonic() - started, 1e-6)
+    log(f"📊 İndirildi: {written/1024/1024:.1f} MB, {written/1024/1024/elapsed:.1f} MB/s (tek bağlantı)")
+    os.replace(part, output)
+    return True
+
+
+def download(url, output, segments=DOWNLOAD_SEGMENTS, session=None, cancel=None,
+             retries=DOWNLOAD_RETRIES, timeout=60, log=print):
+    """
+    url'yi output'a indirir. Başarılıysa True, iptal edilirse False döner;
+    kurtarılamayan hatada DownloadError / requests.RequestException fırlatır.
+    """
+    session = session or requests.Session()
+    size, validator, ranged = probe(session, url, timeout)
+
+    if ranged and size:
+        return _download_ranged(session, url, output, size, validator, segments, cancel, retries, timeout, log)
+
+    return _download_single(session, url, output, size, cancel, timeout, log)
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+fakes.py - Yerel sahte servisler (ağ olmadan test / benchmark için)
+- tts: Edge TTS yerine geçen HTTP sentezleyici (TTS_ENDPOINT ile kullanılır)
+- callback: PHP callback yerine; multipart ve Content-Range parçalı yükleme,
+  --drop-rate ile gövdenin ortasında bağlantıyı koparır (parçalı yüklemede kopmadan
+  önce gelen yarı saklanır, Range ile bildirilir)
+- files: Range destekli dosya sunucusu, GET /file/<boyut> ve /static/<ad>;
+  bağlantı başı hız limiti (--rate) ve --drop-rate ile gövde ortasında kopma
+- tmdb: /movie/<id>/videos (TMDB_API_BASE ile kullanılır)
+- rapidapi: /download_video/<id> + --ready-after sn sonra hazır olan /media/ linki
+  (RAPIDAPI_BASE ile kullanılır)
+
+Kullanım:
+    python fakes.py tts --port 8765 --latency 0.3 --fail-rate 0.1
+    TTS_ENDPOINT=http://127.0.0.1:8765/ python tts.py
+    python fakes.py callback --port 8766 --drop-rate 0.3
+    python fakes.py files --port 8767 --rate 5000000 --drop-rate 0.1
+    python fakes.py tmdb --port 8768 --latency 0.2
+    python fakes.py rapidapi --port 8769 --ready-after 20 --media trailer.mp4
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ============================================
+# ORTAK SUNUCU
+# ============================================
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, latency=0.0, fail_rate=0.0, drop_rate=0.0, rate=0, ready_after=0.0):
+        super().__init__(address, handler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.rate = rate
+        self.ready_after = ready_after
+        self.hits = 0
+        self.lock = threading.Lock()
+        self.state = {}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def simulate(self):
+        # Gecikme + rastgele hata; hata verildiyse False döner
+        with self.server.lock:
+            self.server.hits += 1
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if random.random() < self.server.fail_rate:
+            self.send_bytes(503, b'{"error": "fake failure"}', "application/json")
+            return False
+
+        return True
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def read_or_drop(self, on_partial=None):
+        # drop_rate olasılıkla gövdenin yarısında bağlantıyı koparır → None
+        # (on_partial verilirse kopmadan önce okunan yarı ona verilir)
+        length = int(self.headers.get("Content-Length") or 0)
+
+        if length and random.random() < self.server.drop_rate:
+            partial = self.rfile.read(length // 2)
+            with self.server.lock:
+                self.server.state["drops"] = self.server.state.get("drops", 0) + 1
+            if on_partial:
+                on_partial(partial)
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return None
+
+        return self.rfile.read(length) if length else b""
+
+    def read_json(self):
+        try:
+            return json.loads(self.read_body() or b"{}")
+        except ValueError:
+            return {}
+
+    def send_bytes(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# ============================================
+# SAHTE TTS
+# ============================================
+
+TTS_CHARS_PER_SEC = 15
+
+@lru_cache(maxsize=64)
+def synth_mp3(seconds):
+    # Edge TTS ile aynı format: 24 kHz mono 48 kbps, ID3/Xing başlığı yok
+    cmd = [
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi",
+        "-i", f"sine=frequency=440:sample_rate=24000:duration={seconds:.1f}",
+        "-ac", "1",
+        "-b:a", "48k",
+        "-id3v2_version", "0",
+        "-write_xing", "0",
+        "-f", "mp3",
+        "pipe:1"
+    ]
+    return subprocess.run(cmd, capture_output=True, check=True).stdout
+
+
+class FakeTTSHandler(FakeHandler):
+
+    def do_POST(self):
+        payload = self.read_json()
+
+        if not self.simulate():
+            return
+
+        text = payload.get("text", "")
+        if not text.strip():
+            self.send_bytes(400, b'{"error": "empty text"}', "application/json")
+            return
+
+        seconds = max(0.5, round(len(text) / TTS_CHARS_PER_SEC * 2) / 2)
+        self.send_bytes(200, synth_mp3(seconds), "audio/mpeg")
+
+
+# ============================================
+# SAHTE CALLBACK
+# ============================================
+
+class FakeCallbackHandler(FakeHandler):
+    """
+    Tamamlanan yüklemeler server.state["uploads"] listesine yazılır:
+    {"mode": "multipart" | "resumable", "bytes": n, "sha256": dosya hash'i, "meta": {...}}
+    Parçalı yüklemede her veri isteği server.state["chunks"]: {"start", "committed"}
+    (istemcinin gönderdiği offset, o anda sunucudaki byte sayısı)
+    """
+
+    def do_POST(self):
+        if not self.simulate():
+            self.read_body()
+            return
+
+        if self.headers.get("X-Upload-Id"):
+            self.handle_resumable()
+        else:
+            self.handle_multipart()
+
+    def finish_upload(self, record):
+        with self.server.lock:
+            self.server.state.setdefault("uploads", []).append(record)
+        headers = {"X-Upload-Complete": "1"} if record["mode"] == "resumable" else None
+        self.send_bytes(200, json.dumps({"ok": True, **record}).encode("utf-8"), "application/json", headers)
+
+    def handle_multipart(self):
+        body = self.read_or_drop()
+        if body is None:
+            return
+
+        if not body.rstrip().endswith(b"--"):
+            self.send_bytes(400, b'{"error": "incomplete multipart"}', "application/json")
+            return
+
+        self.finish_upload({"mode": "multipart", "bytes": len(body),
+                            "sha256": hashlib.sha256(self.file_field(body)).hexdigest()})
+
+    def file_field(self, body):
+        # Multipart gövdedeki dosya alanının içeriği (filename= olan parça)
+        boundary = self.headers.get("Content-Type", "").partition("boundary=")[2].encode("utf-8")
+        for part in body.split(b"--" + boundary):
+            head, _, content = part.partition(b"\r\n\r\n")
+            if b"filename=" in head:
+                return content[:-2]
+        return b""
+
+    def handle_resumable(self):
+        upload_id = self.headers["X-Upload-Id"]
+        _, _, spec = self.headers.get("Content-Range", "").partition(" ")
+        span, _, total = spec.partition("/")
+        total = int(total or 0)
+
+        with self.server.lock:
+            received = self.server.state.setdefault("parts", {}).setdefault(upload_id, bytearray())
+
+        if span == "*":
+            self.read_body()
+            if received and len(received) >= total:
+                self.finish_upload({"mode": "resumable", "bytes": len(received),
+                                    "sha256": hashlib.sha256(received).hexdigest()})
+            else:
+                self.send_progress(received)
+            return
+
+        start = int(span.split("-")[0])
+        with self.server.lock:
+            self.server.state.setdefault("chunks", []).append({"start": start, "committed": len(received)})
+
+        def accept(data):
+            # Sadece kaldığı yerden gelen parça kabul edilir
+            if start == len(received):
+                received.extend(data)
+
+        body = self.read_or_drop(on_partial=accept)
+        if body is None:
+            return
+        accept(body)
+
+        if len(received) >= total:
+            meta = json.loads(self.headers.get("X-Upload-Meta") or "{}")
+            self.finish_upload({"mode": "resumable", "bytes": len(received),
+                                "sha256": hashlib.sha256(received).hexdigest(), "meta": meta})
+        else:
+            self.send_progress(received)
+
+    def send_progress(self, received):
+        self.send_response(308)
+        if received:
+            self.send_header("Range", f"bytes=0-{len(received) - 1}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+# ============================================
+# SAHTE DOSYA SUNUCUSU (RANGE)
+# ============================================
+
+PATTERN = bytes(range(256)) * 4096  # 1 MB, içerik offset'ten hesaplanabilir
+
+
+def file_bytes(start, end):
+    # Sentetik dosyanın [start, end] aralığı; indirme doğrulaması için
+    out = bytearray()
+    position = start
+    while position <= end:
+        offset = position % len(PATTERN)
+        piece = PATTERN[offset:offset + (end - position + 1)]
+        out += piece
+        position += len(piece)
+    return bytes(out)
+
+
+def read_file(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start + 1)
+
+
+class FakeFilesHandler(FakeHandler):
+    """
+    GET/HEAD /file/<boyut>  → sentetik içerik (file_bytes)
+    GET/HEAD /static/<ad>   → server.state["static"][ad] yolundaki gerçek dosya
+    """
+
+    def parse_range(self, size):
+        value = self.headers.get("Range", "")
+        if not value.startswith("bytes="):
+            return None
+
+        first, _, last = value[6:].partition("-")
+        start = int(first) if first else size - int(last)
+        end = int(last) if first and last else size - 1
+        return start, min(end, size - 1)
+
+    def resource(self):
+        # (boyut, okuyucu(start, end), etag) veya None
+        path = self.path.split("?", 1)[0].rstrip("/")
+
+        if path.startswith("/static/"):
+            real = self.server.state.get("static", {}).get(path[len("/static/"):])
+            if real:
+                size = os.path.getsize(real)
+                return size, lambda start, end: read_file(real, start, end), f'"static-{size}"'
+            return None
+
+        if path.startswith("/file/"):
+            try:
+                size = int(path.rsplit("/", 1)[-1])
+            except ValueError:
+                return None
+            return size, file_bytes, f'"fake-{size}"'
+
+        return None
+
+    def send_file_headers(self, status, size, start, end, etag):
+        self.send_response(status)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+
+    def send_empty(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        if not self.simulate():
+            return
+
+        found = self.resource()
+        if found is None:
+            self.send_empty(404)
+            return
+
+        size, _, etag = found
+        self.send_file_headers(200, size, 0, size - 1, etag)
+
+    def do_GET(self):
+        found = self.resource()
+        if found is None:
+            self.send_bytes(404, b"not found", "text/plain")
+            return
+        if not self.simulate():
+            return
+
+        self.send_file(*found)
+
+    def send_file(self, size, reader, etag):
+        requested = self.parse_range(size)
+        start, end = requested or (0, size - 1)
+        self.send_file_headers(206 if requested else 200, size, start, end, etag)
+
+        # drop_rate: gövdenin rastgele bir yerinde bağlantıyı kopar
+        drop_at = end + 1
+        if end - start > 1 and random.random() < self.server.drop_rate:
+            drop_at = random.randint(start + 1, end)
+
+        block = 64 * 1024
+        position = start
+        try:
+            while position <= end:
+                if position >= drop_at:
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+
+                stop = min(end, position + block - 1, drop_at - 1)
+                self.wfile.write(reader(position, stop))
+
+                if self.server.rate:
+                    time.sleep((stop - position + 1) / self.server.rate)
+                position = stop + 1
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+# ============================================
+# SAHTE TMDB
+# ============================================
+
+class FakeTMDBHandler(FakeHandler):
+    """
+    GET /movie/<id>/videos?language=... → en-US'de Trailer + Teaser + Clip (montaj
+    adayları), diğer dillerde boş. YouTube key'leri tmdb id'den türetilir (11 karakter).
+    """
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        parts = path.strip("/").split("/")
+
+        if len(parts) != 3 or parts[0] != "movie" or parts[2] != "videos":
+            self.send_bytes(404, b'{"status_message": "not found"}', "application/json")
+            return
+        if not self.simulate():
+            return
+
+        params = dict(p.partition("=")[::2] for p in query.split("&") if p)
+        results = []
+        if params.get("language") == "en-US":
+            for prefix, kind in (("", "Trailer"), ("t", "Teaser"), ("c", "Clip")):
+                results.append({
+                    "site": "YouTube",
+                    "type": kind,
+                    "key": (prefix + parts[1]).rjust(11, "0")[-11:],
+                    "name": f"Fake {kind} {parts[1]}",
+                })
+
+        self.send_bytes(200, json.dumps({"id": parts[1], "results": results}).encode("utf-8"), "application/json")
+
+
+# ============================================
+# SAHTE RAPIDAPI + GECİKMELİ DOSYA SUNUCUSU
+# ============================================
+
+class FakeRapidAPIHandler(FakeFilesHandler):
+    """
+    GET /download_video/<youtube_id> → {"file", "reserved_file"} (bu sunucuya işaret eder)
+    GET/HEAD /media/<youtube_id>.mp4 → ilk link isteğinden ready_after sn sonrasına kadar
+    404, sonra server.state["media"] dosyası (Range destekli). Key kullanımı
+    server.state["keys"] içinde sayılır.
+    """
+
+    def do_GET(self):
+        if self.path.startswith("/download_video/"):
+            self.handle_download_video()
+            return
+        super().do_GET()
+
+    def handle_download_video(self):
+        youtube_id = self.path.split("?", 1)[0].rsplit("/", 1)[-1]
+        api_key = self.headers.get("x-rapidapi-key", "")
+
+        with self.server.lock:
+            keys = self.server.state.setdefault("keys", {})
+            keys[api_key] = keys.get(api_key, 0) + 1
+
+        if not self.simulate():
+            return
+
+        with self.server.lock:
+            self.server.state.setdefault("requested", {}).setdefault(youtube_id, time.monotonic())
+
+        body = {
+            "id": youtube_id,
+            "file": f"{self.server.url}/media/{youtube_id}.mp4",
+            "reserved_file": f"{self.server.url}/media/{youtube_id}.mp4?reserved=1",
+        }
+        self.send_bytes(200, json.dumps(body).encode("utf-8"), "application/json")
+
+    def resource(self):
+        path = self.path.split("?", 1)[0]
+        if not path.startswith("/media/"):
+            return super().resource()
+
+        youtube_id = path[len("/media/"):].rsplit(".", 1)[0]
+        requested = self.server.state.get("requested", {}).get(youtube_id)
+        media = self.server.state.get("media")
+
+        # Link istenmemiş ya da henüz "hazırlanıyor"
+        if requested is None or not media or time.monotonic() - requested < self.server.ready_after:
+            return None
+
+        size = os.path.getsize(media)
+        return size, lambda start, end: read_file(media, start, end), f'"media-{size}"'
+
+
+HANDLERS = {
+    "tts": FakeTTSHandler,
+    "callback": FakeCallbackHandler,
+    "files": FakeFilesHandler,
+    "tmdb": FakeTMDBHandler,
+    "rapidapi": FakeRapidAPIHandler,
+}
+
+
+def start(kind, port=0, latency=0.0, fail_rate=0.0, drop_rate=0.0, rate=0, ready_after=0.0):
+    # Arka plan thread'inde başlatır; server.url ile adres alınır
+    server = FakeServer(("127.0.0.1", port), HANDLERS[kind], latency, fail_rate, drop_rate, rate, ready_after)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Yerel sahte servisler")
+    parser.add_argument("kind", choices=sorted(HANDLERS))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="istek başı gecikme (sn)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="0-1 arası hata oranı")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="0-1 arası bağlantı koparma oranı")
+    parser.add_argument("--rate", type=int, default=0, help="bağlantı başı hız limiti (byte/sn, 0 = limitsiz)")
+    parser.add_argument("--ready-after", type=float, default=0.0, help="rapidapi: link kaç sn sonra hazır")
+    parser.add_argument("--media", help="rapidapi: /media/ altında servis edilecek video dosyası")
+    args = parser.parse_args()
+
+    server = FakeServer(("127.0.0.1", args.port), HANDLERS[args.kind], args.latency, args.fail_rate,
+                        args.drop_rate, args.rate, args.ready_after)
+    if args.media:
+        server.state["media"] = args.media
+    print(f"🧪 Sahte {args.kind} servisi: {server.url}/")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
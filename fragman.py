@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 fragman.py - Film İnceleme Fragman Sistemi (SADECE RAPIDAPI)
-- TMDB'den fragman YouTube ID alır
+- TMDB'den fragman YouTube ID alır (.cache/tmdb.sqlite, TTL'li)
 - RapidAPI ile indirir (3 key fallback)
 - Ses dosyasının süresine göre videoyu kırpar
 - Ses ile videoyu birleştirir
@@ -11,12 +11,28 @@ fragman.py - Film İnceleme Fragman Sistemi (SADECE RAPIDAPI)
 import os
 import json
 import time
+import random
+import hashlib
 import sys
 import logging
 import requests
-import subprocess
-import http.client
-from datetime import datetime
+import shutil
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+
+from cache import DiskCache, TTLCache, make_key
+from checkpoint import Checkpoint
+from downloader import download
+from mediainfo import Mp3Duration, mp4_duration, scan_mp3
+from slots import cpu_slot
+import slots
+from tracing import Tracer, current_span, span
+import tracing
+from uploader import upload_file, upload_ok
 
 # ============================================
 # LOGLAMA
@@ -54,6 +70,22 @@ def setup_logging():
 
 logger = setup_logging()
 
+# ============================================
+# İPTAL YARDIMCILARI
+# ============================================
+
+def is_cancelled(cancel):
+    return cancel is not None and cancel.is_set()
+
+
+def sleep_or_cancel(seconds, cancel):
+    # İptal edilirse hemen uyanır ve True döner
+    if cancel is None:
+        time.sleep(seconds)
+        return False
+    return cancel.wait(seconds)
+
+
 # ============================================
 # RAPIDAPI KEY SİSTEMİ
 # ============================================
@@ -84,6 +116,108 @@ def get_rapidapi_keys():
     return keys
 
 
+RAPIDAPI_HOST = "youtube-video-fast-downloader-24-7.p.rapidapi.com"
+RAPIDAPI_BASE = os.environ.get("RAPIDAPI_BASE", f"https://{RAPIDAPI_HOST}")   # test: python fakes.py rapidapi
+KEY_HEALTH_FILE = os.environ.get("RAPIDAPI_HEALTH_FILE", os.path.join(".cache", "rapidapi_health.json"))
+HEDGE_AFTER = float(os.environ.get("RAPIDAPI_HEDGE_AFTER", "8"))
+
+
+class KeyScheduler:
+    """
+    Key başına sağlık bilgisini (başarı oranı, gecikme, 429/403 sayısı, kota
+    sıfırlanma zamanı) çalıştırmalar arasında JSON dosyasında tutar ve key'leri
+    beklenen başarıya göre sıralar. Dosyada key'in kendisi değil hash'i durur.
+    """
+
+    def __init__(self, path=KEY_HEALTH_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.health = {}
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.health = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def key_id(api_key):
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+    def _entry(self, api_key):
+        return self.health.setdefault(self.key_id(api_key), {
+            "success": 1.0,        # EWMA, iyimser başlar
+            "latency": None,       # EWMA (sn)
+            "rate_limited": 0,
+            "forbidden": 0,
+            "quota_reset": 0,      # epoch; bu zamana kadar kota dolu
+            "last_used": 0,
+        })
+
+    def ordered(self, keys):
+        now = time.time()
+
+        def rank(api_key):
+            h = self.health.get(self.key_id(api_key), {})
+            exhausted = h.get("quota_reset", 0) > now
+            latency = h.get("latency")
+            return (exhausted, -h.get("success", 1.0), latency if latency is not None else 0.0)
+
+        ordered = sorted(keys, key=rank)
+        for api_key in ordered:
+            h = self.health.get(self.key_id(api_key))
+            if h:
+                logger.info(f"🩺 {api_key[:8]}... başarı {h['success']:.2f}, "
+                            f"gecikme {h['latency'] or 0:.1f} sn, 429: {h['rate_limited']}, 403: {h['forbidden']}")
+        return ordered
+
+    def record(self, api_key, ok, latency=None, status=None, headers=None):
+        with self.lock:
+            h = self._entry(api_key)
+            h["success"] = 0.7 * h["success"] + 0.3 * (1.0 if ok else 0.0)
+            h["last_used"] = time.time()
+
+            if latency is not None:
+                h["latency"] = latency if h["latency"] is None else 0.7 * h["latency"] + 0.3 * latency
+
+            if status == 429:
+                h["rate_limited"] += 1
+                reset = (headers or {}).get("x-ratelimit-requests-reset") or parse_retry_after(headers or {})
+                try:
+                    reset = float(reset or 3600)
+                except ValueError:
+                    reset = 3600
+                h["quota_reset"] = time.time() + reset
+            elif status == 403:
+                h["forbidden"] += 1
+                h["quota_reset"] = time.time() + 3600
+
+            self._save()
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.health, f, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Key sağlık dosyası yazılamadı: {e}")
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def key_scheduler():
+    # Süreç başına tek örnek: worker modunda eşzamanlı işler aynı sağlık verisini paylaşır
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = KeyScheduler()
+        return _scheduler
+
+
 # ============================================
 # YOUTUBE ID ÇIKARMA
 # ============================================
@@ -112,242 +246,936 @@ def extract_video_id(url):
 # TMDB'DEN FRAGMAN BUL
 # ============================================
 
-def get_youtube_url_from_tmdb(tmdb_id, api_key):
+TMDB_API_BASE      = os.environ.get("TMDB_API_BASE", "https://api.themoviedb.org/3")   # test: python fakes.py tmdb
+TMDB_LANGUAGES     = ["en-US", "en", "tr-TR", "tr", None]
+TMDB_CACHE_FILE    = os.environ.get("TMDB_CACHE_FILE", os.path.join(".cache", "tmdb.sqlite"))
+TMDB_CACHE_TTL     = int(os.environ.get("TMDB_CACHE_TTL", str(7 * 24 * 3600)))
+TMDB_NEGATIVE_TTL  = int(os.environ.get("TMDB_NEGATIVE_TTL", str(12 * 3600)))
+# Ses fragmandan uzunsa montaj için en fazla kaç video (ilk fragman dahil)
+MONTAGE_MAX_CLIPS  = max(1, int(os.environ.get("MONTAGE_MAX_CLIPS", "3")))
+MONTAGE_TYPES      = ["Trailer", "Teaser", "Clip", "Featurette"]
+
+tmdb_session = requests.Session()
+tmdb_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=len(TMDB_LANGUAGES)))
+
+tmdb_cache = TTLCache(TMDB_CACHE_FILE, table="trailers")
+
+
+def fetch_tmdb_videos(tmdb_id, api_key, lang):
+    # Tek dil için /videos sonuçları; hata olursa None (boş liste ≠ hata)
+    url = f"{TMDB_API_BASE}/movie/{tmdb_id}/videos"
+    params = {'api_key': api_key}
+
+    if lang:
+        params["language"] = lang
+
     try:
-        languages = ["en-US", "en", "tr-TR", "tr", None]
-        
-        for lang in languages:
-            url = f"https://api.themoviedb.org/3/movie/{tmdb_id}/videos"
-            params = {'api_key': api_key}
+        response = tmdb_session.get(url, params=params, timeout=15)
+    except requests.RequestException as e:
+        logger.error(f"❌ TMDB videos API bağlantı hatası ({lang}): {str(e)[:150]}")
+        return None
 
-            if lang:
-                params["language"] = lang
+    if response.status_code != 200:
+        logger.error(f"❌ TMDB videos API hata ({lang}): {response.status_code}")
+        return None
 
-            response = requests.get(url, params=params, timeout=15)
+    return response.json().get("results", [])
 
-            if response.status_code != 200:
-                logger.error(f"❌ TMDB videos API hata ({lang}): {response.status_code}")
-                continue
 
-            data = response.json()
-            results = data.get("results", [])
+def pick_trailer(results_by_lang):
+    # Dil sırasıyla: önce Trailer, Trailer yoksa aynı dilde herhangi YouTube video
+    for lang in TMDB_LANGUAGES:
+        results = results_by_lang.get(lang) or []
+
+        for video in results:
+            if video.get("site") == "YouTube" and video.get("type") == "Trailer":
+                return lang, video
+
+        for video in results:
+            if video.get("site") == "YouTube":
+                return lang, video
+
+    return None, None
+
+
+def pick_videos(results_by_lang, limit=MONTAGE_MAX_CLIPS):
+    # İlk video pick_trailer ile aynı; montaj için ardından tür sırasıyla (Trailer,
+    # Teaser, Clip, ...) ve her türde dil sırasıyla diğer YouTube videoları
+    lang, first = pick_trailer(results_by_lang)
+    if not first:
+        return []
+
+    picked = [first]
+    seen = {first.get("key")}
+
+    for kind in MONTAGE_TYPES:
+        for lang in TMDB_LANGUAGES:
+            for video in results_by_lang.get(lang) or []:
+                if len(picked) >= limit:
+                    return picked
+                if video.get("site") == "YouTube" and video.get("type") == kind and video.get("key") not in seen:
+                    seen.add(video.get("key"))
+                    picked.append(video)
+
+    return picked
+
+
+def get_youtube_urls_from_tmdb(tmdb_id, api_key):
+    # Önce asıl fragman, sonra montaj adayları; bulunamazsa []
+    # Aday listesi MONTAGE_MAX_CLIPS'e bağlı: ayar değişince eski liste kullanılmasın
+    cache_key = f"{tmdb_id}|clips={MONTAGE_MAX_CLIPS}"
+
+    try:
+        cached = tmdb_cache.get(cache_key)
+        if cached is not None:
+            if not cached["key"]:
+                logger.warning("⚠️ TMDB cache: bu film için fragman yok (negatif kayıt)")
+                return []
+            logger.info(f"💾 TMDB cache: {cached['name']} ({cached['language']})")
+            keys = [cached["key"], *cached.get("extras", [])]
+            return [f"https://www.youtube.com/watch?v={key}" for key in keys]
+    except Exception as e:
+        logger.warning(f"⚠️ TMDB cache okunamadı: {str(e)[:150]}")
+
+    try:
+        # Tüm diller aynı anda istenir; seçim yine dil sırasına göre
+        with span("tmdb"), ThreadPoolExecutor(max_workers=len(TMDB_LANGUAGES)) as pool:
+            results = list(pool.map(lambda lang: fetch_tmdb_videos(tmdb_id, api_key, lang), TMDB_LANGUAGES))
+        results_by_lang = dict(zip(TMDB_LANGUAGES, results))
 
-            if not results:
+        for lang, found in results_by_lang.items():
+            if found == []:
                 logger.warning(f"⚠️ TMDB sonuç yok ({lang})")
-                continue
 
-            # Önce Trailer ara
-            for video in results:
-                if video.get("site") == "YouTube" and video.get("type") == "Trailer":
-                    key = video.get("key")
-                    name = video.get("name", "")
-                    logger.info(f"✅ TMDB Trailer bulundu ({lang}): {name}")
-                    return f"https://www.youtube.com/watch?v={key}"
-
-            # Trailer yoksa herhangi YouTube video al
-            for video in results:
-                if video.get("site") == "YouTube":
-                    key = video.get("key")
-                    name = video.get("name", "")
-                    logger.info(f"✅ TMDB YouTube video bulundu ({lang}): {name}")
-                    return f"https://www.youtube.com/watch?v={key}"
+        lang, video = pick_trailer(results_by_lang)
+
+        if video:
+            kind = "Trailer" if video.get("type") == "Trailer" else "YouTube video"
+            logger.info(f"✅ TMDB {kind} bulundu ({lang}): {video.get('name', '')}")
+
+            extras = [v.get("key") for v in pick_videos(results_by_lang)[1:]]
+            if extras:
+                logger.info(f"🎞️ Montaj adayları: {len(extras)} video daha")
+
+            _cache_trailer(cache_key, {
+                "key": video.get("key"),
+                "name": video.get("name", ""),
+                "type": video.get("type"),
+                "language": lang,
+                "extras": extras,
+            }, TMDB_CACHE_TTL)
+            return [f"https://www.youtube.com/watch?v={key}" for key in [video.get("key"), *extras]]
 
         logger.warning("⚠️ TMDB içinde hiçbir dilde YouTube fragman bulunamadı")
-        return None
+
+        # Sadece tüm diller cevap verdiyse "fragman yok" kesin; hata varsa tekrar denensin
+        if all(found is not None for found in results):
+            _cache_trailer(cache_key, {"key": None}, TMDB_NEGATIVE_TTL)
+        return []
 
     except Exception as e:
         logger.error(f"❌ TMDB fragman bulma hatası: {str(e)}")
-        return None
+        return []
+
+
+def _cache_trailer(cache_key, value, ttl):
+    try:
+        tmdb_cache.put(cache_key, {**value, "fetched_at": int(time.time())}, ttl)
+    except Exception as e:
+        logger.warning(f"⚠️ TMDB cache yazılamadı: {str(e)[:150]}")
 
 
 # ============================================
 # RAPIDAPI İLE İNDİRME
 # ============================================
 
+# stream: ffmpeg hazır linkten doğrudan okur, raw_*.mp4 diske yazılmaz
+# file  : önce tüm video raw_*.mp4 olarak indirilir (eski davranış)
+VIDEO_SOURCE = os.environ.get("VIDEO_SOURCE", "stream")
+VIDEO_QUALITY = "247"
+# Akış modunda RapidAPI linki checkpoint'te bu kadar geçerli sayılır (sonra yeniden istenir)
+VIDEO_LINK_TTL = int(os.environ.get("VIDEO_LINK_TTL", 1800))
 
+# ============================================
+# FRAGMAN CACHE (YOUTUBE ID + KALİTE)
+# ============================================
 
-def download_via_rapidapi_fast(youtube_id, output_file):
-    rapidapi_keys = get_rapidapi_keys()  # eski fonksiyonun buysa bunu kullan
-    if not rapidapi_keys:
-        logger.error("❌ RapidAPI key yok")
-        return False
+TRAILER_CACHE_DIR = os.path.join(".cache", "trailers")
+TRAILER_CACHE_MB  = int(os.environ.get("TRAILER_CACHE_MB", "2000"))   # 0 = kapalı
+# Akış modunda linkin cache için ayrıca indirilmesi; iş tam indirmeyi beklediği için isteğe bağlı
+TRAILER_CACHE_FILL = os.environ.get("TRAILER_CACHE_FILL", "") == "1"
 
-    host = "youtube-video-fast-downloader-24-7.p.rapidapi.com"
-    path = f"/download_video/{youtube_id}?quality=247"
+trailer_cache = DiskCache(TRAILER_CACHE_DIR, TRAILER_CACHE_MB * 1024 * 1024, suffix=".mp4")
 
-    logger.info(f"🔑 Toplam RapidAPI key sayısı: {len(rapidapi_keys)}")
 
-    for i, api_key in enumerate(rapidapi_keys):
-        api_key = api_key.strip()
+def trailer_key(youtube_id, quality=VIDEO_QUALITY):
+    return make_key("trailer", youtube_id, quality)
 
-        try:
-            logger.info(f"🚀 RapidAPI deneniyor: {api_key[:8]}... ({i+1}/{len(rapidapi_keys)})")
 
-            conn = http.client.HTTPSConnection(host, timeout=180)
+def cached_trailer(youtube_id):
+    # Boyut + sha256 doğrulanmış cache dosyası, yoksa None
+    if TRAILER_CACHE_MB <= 0:
+        return None
 
-            headers = {
-                "x-rapidapi-key": api_key,
-                "x-rapidapi-host": host
-            }
+    path = trailer_cache.lookup(trailer_key(youtube_id), verify=True)
+    if path:
+        logger.info(f"💾 Fragman cache'ten: {youtube_id} ({os.path.getsize(path)/1024/1024:.1f} MB)")
+    return path
 
-            conn.request("GET", path, headers=headers)
-            res = conn.getresponse()
-            raw = res.read().decode("utf-8", errors="ignore")
 
-            logger.info(f"📡 RapidAPI Response: {res.status}")
+def store_trailer(youtube_id, path):
+    if TRAILER_CACHE_MB <= 0 or not os.path.exists(path) or os.path.getsize(path) <= MIN_VIDEO_BYTES:
+        return None
 
-            if res.status != 200:
-                logger.warning(f"⚠️ RapidAPI HTTP {res.status}: {raw[:200]}")
-                time.sleep(3)
-                continue
+    try:
+        cached = trailer_cache.put_file(trailer_key(youtube_id), path)
+        logger.info(f"💾 Fragman cache'e alındı: {youtube_id}")
+        return cached
+    except OSError as e:
+        logger.warning(f"⚠️ Fragman cache'e yazılamadı: {str(e)[:150]}")
+        return None
+
+
+def fill_trailer_cache(youtube_id, url, scratch, cancel=None):
+    # Akış modunda render linkten okur; cache için aynı link arka planda indirilir
+    if TRAILER_CACHE_MB <= 0 or trailer_cache.lookup(trailer_key(youtube_id)):
+        return None
+
+    try:
+        if download_file(url, scratch, cancel):
+            return store_trailer(youtube_id, scratch)
+    finally:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+    return None
+
+
+
+# ============================================
+# HAZIR OLMA KONTROLÜ (ADAPTİF POLLING)
+# ============================================
+
+POLL_DEADLINE   = 320     # API 20-300 sn diyor
+POLL_MIN_DELAY  = 1.0
+POLL_MAX_DELAY  = 15.0
+MIN_VIDEO_BYTES = 1000000
+
+# Bağlantılar tekrar kullanılsın (HEAD + GET aynı host'a gidiyor)
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=16))
+http_session.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=16))
+
+
+def parse_retry_after(headers):
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def wait_until_ready(urls, cancel=None, deadline=POLL_DEADLINE):
+    """
+    Linkleri paralel yoklar; ilk hazır olan (200 + > 1 MB) linki döner, yoksa None.
+    Bekleme: hızlı başlayan exponential backoff + jitter. Retry-After gelirse ona,
+    boyut büyüyorsa büyüme hızından tahmin edilen kalan süreye göre beklenir.
+    """
+    urls = list(dict.fromkeys(u for u in urls if u))
+    done = threading.Event()
+    winner = []
+    lock = threading.Lock()
+    started = time.monotonic()
+
+    def poll(url):
+        delay = POLL_MIN_DELAY
+        last_size = last_time = None
+
+        while not done.is_set():
+            elapsed = time.monotonic() - started
+            if elapsed >= deadline:
+                return
+
+            hint = None
 
-            # JSON parse (en kritik fix)
             try:
-                video_info = json.loads(raw)
+                head = http_session.head(url, timeout=15, allow_redirects=True)
+                size = int(head.headers.get("content-length") or 0)
+
+                if head.status_code == 200 and size > MIN_VIDEO_BYTES:
+                    with lock:
+                        if not winner:
+                            winner.append(url)
+                            logger.info(f"✅ Video hazır! ({elapsed:.1f} sn) Boyut: {size/1024/1024:.1f} MB | {url[:70]}...")
+                    done.set()
+                    return
+
+                if head.status_code == 200:
+                    # Link aktif ama dosya büyüyor: büyüme hızından kalan süreyi tahmin et
+                    now = time.monotonic()
+                    if last_size is not None and size > last_size:
+                        rate = (size - last_size) / (now - last_time)
+                        hint = (MIN_VIDEO_BYTES - size) / rate
+                    else:
+                        hint = POLL_MIN_DELAY
+                    last_size, last_time = size, now
+                    logger.info(f"⏳ Link aktif ama video daha tam hazır değil ({size} bytes, {elapsed:.0f} sn)")
+
+                elif head.status_code == 404:
+                    logger.info(f"⏳ Video henüz hazır değil (404, {elapsed:.0f} sn): {url[:50]}...")
+
+                else:
+                    logger.warning(f"⚠️ Video link HTTP {head.status_code}")
+
+                retry_after = parse_retry_after(head.headers)
+                if retry_after is not None:
+                    hint = retry_after
+
             except Exception as e:
-                logger.warning(f"⚠️ JSON parse hatası: {str(e)} | RAW: {raw[:200]}")
-                time.sleep(3)
-                continue
+                logger.warning(f"⚠️ URL kontrol hatası: {str(e)[:150]}")
 
-            video_url = video_info.get("file")
-            reserved_url = video_info.get("reserved_file") or video_url
+            wait_for = hint if hint is not None else delay
+            wait_for = min(POLL_MAX_DELAY, max(0.5, wait_for)) * random.uniform(0.8, 1.2)
+            delay = min(POLL_MAX_DELAY, delay * 1.7)
 
-            if not video_url:
-                logger.warning(f"⚠️ RapidAPI file vermedi: {raw[:200]}")
-                time.sleep(3)
-                continue
+            if done.wait(min(wait_for, max(0.0, deadline - elapsed))):
+                return
 
-            logger.info(f"🔗 Video URL: {video_url[:80]}...")
-            logger.info(f"🔗 Reserved URL: {reserved_url[:80]}...")
+    threads = [threading.Thread(target=poll, args=(url,), daemon=True) for url in urls]
+    for thread in threads:
+        thread.start()
 
-            logger.info("⏳ Video hazırlanıyor, link aktif olana kadar bekleniyor...")
+    # İptal gelirse pollerları durdur
+    while any(thread.is_alive() for thread in threads):
+        if is_cancelled(cancel):
+            done.set()
+        for thread in threads:
+            thread.join(timeout=0.5)
 
-            urls_to_try = [video_url, reserved_url]
+    return winner[0] if winner and not is_cancelled(cancel) else None
 
-            # max 320 saniye bekle (API zaten 20-300 diyor)
-            for wait_seconds in range(0, 320, 10):
 
-                for url in urls_to_try:
-                    try:
-                        logger.info(f"⏱️ Kontrol {wait_seconds}/320: {url[:70]}...")
+def download_file(url, output_file, cancel=None):
+    logger.info("📥 Video indiriliyor...")
 
-                        head = requests.head(url, timeout=15, allow_redirects=True)
+    try:
+        # Range destekliyse çok bağlantılı + .part ile devam ettirilebilir
+        with span("transfer") as s:
+            if not download(url, output_file, session=http_session, cancel=cancel, log=logger.info):
+                return False
+            s.add_bytes(os.path.getsize(output_file))
+    except Exception as e:
+        logger.warning(f"⚠️ Video indirme hatası: {str(e)[:200]}")
+        return False
 
-                        if head.status_code == 200:
-                            size = head.headers.get("content-length")
+    file_size = os.path.getsize(output_file)
 
-                            if size and int(size) > 1000000:
-                                logger.info(f"✅ Video hazır! Boyut: {int(size)/1024/1024:.1f} MB")
-                                logger.info("📥 Video indiriliyor...")
+    if file_size > MIN_VIDEO_BYTES:
+        logger.info(f"🎉 RapidAPI ile indirildi! ({file_size/1024/1024:.1f} MB)")
+        return True
 
-                                with requests.get(url, stream=True, timeout=300) as download:
-                                    download.raise_for_status()
+    logger.warning(f"⚠️ Dosya çok küçük çıktı: {file_size} bytes")
+    os.remove(output_file)
+    return False
 
-                                    with open(output_file, "wb") as f:
-                                        total = int(download.headers.get("content-length", 0))
-                                        downloaded = 0
 
-                                        for chunk in download.iter_content(chunk_size=1024 * 1024):
-                                            if chunk:
-                                                f.write(chunk)
-                                                downloaded += len(chunk)
+def request_video_info(api_key, youtube_id, scheduler):
+    # RapidAPI'den dosya linklerini ister; sonucu key sağlığına işler
+    url = f"{RAPIDAPI_BASE}/download_video/{youtube_id}"
+    headers = {
+        "x-rapidapi-key": api_key,
+        "x-rapidapi-host": RAPIDAPI_HOST
+    }
 
-                                                if total > 0 and downloaded % (5 * 1024 * 1024) < (1024 * 1024):
-                                                    progress = (downloaded / total) * 100
-                                                    logger.info(f"📊 İlerleme: {progress:.1f}% ({downloaded/1024/1024:.1f} MB)")
+    started = time.monotonic()
+    try:
+        res = http_session.get(url, params={"quality": VIDEO_QUALITY}, headers=headers, timeout=180)
+    except Exception:
+        scheduler.record(api_key, False, time.monotonic() - started)
+        raise
+
+    latency = time.monotonic() - started
+    raw = res.text
+    logger.info(f"📡 RapidAPI Response: {res.status_code} ({latency:.1f} sn, {api_key[:8]}...)")
+
+    video_info = None
+    if res.status_code == 200:
+        # JSON parse (en kritik fix)
+        try:
+            video_info = json.loads(raw)
+        except ValueError as e:
+            logger.warning(f"⚠️ JSON parse hatası: {str(e)} | RAW: {raw[:200]}")
+
+    ok = bool(video_info and video_info.get("file"))
+    scheduler.record(api_key, ok, latency, res.status_code, res.headers)
+
+    if res.status_code != 200:
+        raise RuntimeError(f"RapidAPI HTTP {res.status_code}: {raw[:200]}")
+    if not ok:
+        raise RuntimeError(f"RapidAPI file vermedi: {raw[:200]}")
+
+    return video_info
+
+
+def hedged_video_info(keys, youtube_id, scheduler, cancel=None, spares=None):
+    """
+    keys listesinden sırayla key tüketir. İlk istek HEDGE_AFTER saniyede link
+    vermezse bir sonraki key ile paralel ikinci istek atılır; ilk başarılı kazanır.
+    (api_key, video_info) veya (None, None) döner.
+    spares ({future: api_key}): kaybeden istekler iptal edilmez, buraya konur; sonraki
+    çağrıda (kazananın linki hazırlanmazsa) yeni istek atılmadan önce onlar beklenir.
+    """
+    pool = ThreadPoolExecutor(max_workers=2)
+    running = {}
+    # Yedekler zaten HEDGE_AFTER'dan uzun süredir yolda: bitene kadar hedge edilmez
+    inherited = set(spares or ())
+    if spares:
+        logger.info(f"♻️ Önceki turdan {len(spares)} RapidAPI yanıtı yedek olarak bekleniyor")
+        running.update(spares)
+        spares.clear()
+
+    def launch():
+        api_key = keys.pop(0)
+        logger.info(f"🚀 RapidAPI deneniyor: {api_key[:8]}... (kalan key: {len(keys)})")
+        running[pool.submit(request_video_info, api_key, youtube_id, scheduler)] = api_key
 
-                                if os.path.exists(output_file):
-                                    file_size = os.path.getsize(output_file)
+    try:
+        while keys or running:
+            if is_cancelled(cancel):
+                return None, None
 
-                                    if file_size > 1000000:
-                                        logger.info(f"🎉 RapidAPI ile indirildi! ({file_size/1024/1024:.1f} MB)")
-                                        logger.info(f"🔑 Kullanılan Key: {api_key[:8]}...")
-                                        return True
-                                    else:
-                                        logger.warning(f"⚠️ Dosya çok küçük çıktı: {file_size} bytes")
-                                        os.remove(output_file)
+            if not running:
+                launch()
 
-                                break  # head 200 aldıysa döngüyü kır
+            done, _ = wait(running, timeout=HEDGE_AFTER, return_when=FIRST_COMPLETED)
 
-                            else:
-                                logger.info("⏳ Link aktif ama video daha tam hazır değil (boyut küçük)")
+            if not done:
+                if keys and len(running) < 2 and not inherited & running.keys():
+                    logger.info(f"🪁 {HEDGE_AFTER:.0f} sn'de link gelmedi, paralel key deneniyor")
+                    launch()
+                continue
 
-                        elif head.status_code == 404:
-                            logger.info("⏳ Video henüz hazır değil (404)")
+            for future in done:
+                api_key = running.pop(future)
+                try:
+                    video_info = future.result()
+                except Exception as e:
+                    logger.warning(f"⚠️ {api_key[:8]}... başarısız: {str(e)[:200]}")
+                    continue
 
-                        else:
-                            logger.warning(f"⚠️ Video link HTTP {head.status_code}")
+                if spares is not None:
+                    spares.update(running)
+                return api_key, video_info
 
-                    except Exception as e:
-                        logger.warning(f"⚠️ URL kontrol hatası: {str(e)[:150]}")
+        return None, None
+
+    finally:
+        # Kaybeden istek arka planda bitsin, bekleme
+        pool.shutdown(wait=False)
+
+
+def resolve_video_url(youtube_id, cancel=None, on_ready=None):
+    """
+    RapidAPI'den dosya linkini alır, link hazır olana kadar bekler.
+    on_ready(url) verilirse hazır link ile çağrılır; False dönerse beklemeye devam edilir.
+    Hazır link (veya None) döner.
+    """
+    rapidapi_keys = get_rapidapi_keys()  # eski fonksiyonun buysa bunu kullan
+    if not rapidapi_keys:
+        logger.error("❌ RapidAPI key yok")
+        return None
+
+    scheduler = key_scheduler()
+    keys = scheduler.ordered(rapidapi_keys)
+
+    logger.info(f"🔑 Toplam RapidAPI key sayısı: {len(keys)}")
+
+    # Hedge'de kaybeden istekler: kazananın linki hazırlanmazsa yeni kota harcanmadan kullanılır
+    spares = {}
+
+    while keys or spares:
+        with span("rapidapi", keys=len(keys)):
+            api_key, video_info = hedged_video_info(keys, youtube_id, scheduler, cancel, spares)
+
+        if is_cancelled(cancel):
+            logger.warning("🛑 RapidAPI indirme iptal edildi")
+            return None
+
+        if not video_info:
+            break
+
+        video_url = video_info.get("file")
+        reserved_url = video_info.get("reserved_file") or video_url
+
+        logger.info(f"🔗 Video URL: {video_url[:80]}...")
+        logger.info(f"🔗 Reserved URL: {reserved_url[:80]}...")
+
+        logger.info("⏳ Video hazırlanıyor, link aktif olana kadar bekleniyor...")
 
-                time.sleep(10)
+        # Her iki link paralel yoklanır; hazır olan ilk link kazanır
+        poll_started = time.monotonic()
 
-            logger.warning(f"⚠️ Bu key ile video hazırlanmadı: {api_key[:8]}...")
+        while True:
+            remaining = POLL_DEADLINE - (time.monotonic() - poll_started)
+            with span("poll"):
+                ready = wait_until_ready([video_url, reserved_url], cancel, remaining)
 
-            if i < len(rapidapi_keys) - 1:
-                logger.info("⏳ Sonraki key için 5 saniye bekleniyor...")
-                time.sleep(5)
+            if ready is None:
+                break
 
-        except Exception as e:
-            logger.error(f"❌ RapidAPI hata: {str(e)}", exc_info=True)
-            time.sleep(3)
+            if on_ready is None or on_ready(ready):
+                logger.info(f"🔑 Kullanılan Key: {api_key[:8]}...")
+                return ready
+
+            if sleep_or_cancel(POLL_MIN_DELAY * 2, cancel):
+                break
+
+        if is_cancelled(cancel):
+            logger.warning("🛑 Video bekleme iptal edildi")
+            return None
+
+        logger.warning(f"⚠️ Bu key ile video hazırlanmadı: {api_key[:8]}...")
+        scheduler.record(api_key, False)
 
     logger.error("❌ Tüm RapidAPI key'ler başarısız")
-    return False
+    return None
+
+
+def download_via_rapidapi_fast(youtube_id, output_file, cancel=None):
+    cached = cached_trailer(youtube_id)
+    if cached:
+        # API / kota harcanmaz; aynı diskte hardlink (put_file'ın tersi), değilse kopya
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        try:
+            os.link(cached, output_file)
+        except OSError:
+            shutil.copyfile(cached, output_file)
+        return True
+
+    url = resolve_video_url(youtube_id, cancel, on_ready=lambda url: download_file(url, output_file, cancel))
+    if url is None:
+        return False
+
+    store_trailer(youtube_id, output_file)
+    return True
 
 # ============================================
 # SES SÜRESİ AL
 # ============================================
 
-def get_audio_duration(audio_path):
+def get_audio_duration(audio_path, parsed=None):
+    """
+    Süre önce saf Python MP3 frame yürüyüşünden (indirme sırasında hesaplanan
+    parsed ya da dosyadan) alınır. Güvenilir değilse ffprobe'a düşülür; o da geçerli
+    bir süre vermezse StageError (eskiden sessizce 180 sn dönüyordu).
+    """
+    if parsed is None:
+        parsed = scan_mp3(audio_path)
+
+    if parsed["reliable"]:
+        logger.info(f"🔊 Ses süresi: {parsed['duration']:.2f} saniye ({parsed['frames']} frame)")
+        return parsed["duration"]
+
+    logger.warning(
+        f"⚠️ MP3 başlığından süre doğrulanamadı (frame: {parsed['frames']}, "
+        f"Xing/VBRI: {parsed['header_frames']}, çöp: {parsed['junk']} bayt), ffprobe deneniyor"
+    )
+
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        audio_path
+    ]
+
     try:
-        cmd = [
-            "ffprobe", "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
-            audio_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = tracing.run(cmd, capture_output=True, text=True)
+        duration = float(result.stdout.strip()) if result.returncode == 0 else 0.0
+    except (OSError, ValueError) as e:
+        raise StageError(f"Ses süresi alınamadı: {e}")
 
-        if result.returncode == 0 and result.stdout.strip():
-            duration = float(result.stdout.strip())
-            logger.info(f"🔊 Ses süresi: {duration:.2f} saniye")
-            return duration
+    if not duration > 0 or duration == float("inf"):
+        raise StageError(f"Ses süresi alınamadı (ffprobe rc={result.returncode})")
 
-    except Exception as e:
-        logger.error(f"❌ Ses süresi alınamadı: {e}")
+    logger.info(f"🔊 Ses süresi (ffprobe): {duration:.2f} saniye")
+    return duration
 
-    return 180.0
+
+# ============================================
+# RENDER PROFİLLERİ (TAM ENCODE)
+# ============================================
+
+# Sadece libx264 ile yeniden encode eden yollarda (TRIM_MODE=encode ve copy/exact
+# başarısız olunca) kullanılır; stream copy'de çözünürlük / fps değişmez.
+# draft   : hızlı önizleme / zaten YouTube'a tekrar yüklenecek arka plan videosu
+# standard: eski sabit ayar (fast, crf 23), 1080p üstü küçültülür; süre sınırı yok
+# archive : kalite öncelikli, kaynak çözünürlük
+RENDER_PROFILE = os.environ.get("RENDER_PROFILE", "standard")
+RENDER_BUDGET = float(os.environ.get("RENDER_BUDGET", "0"))        # sn, 0 = profilin kendi sınırı
+RENDER_BASE_FPS = float(os.environ.get("RENDER_BASE_FPS", "12"))   # medium, 1080p, tek thread (bench.py profiles)
+
+RENDER_PROFILES = {
+    # realtime: encode süresi / klip süresi üst sınırı (None = sınırsız)
+    "draft": {"preset": "veryfast", "crf": 28, "height": 720, "fps": 30, "realtime": 0.25},
+    "standard": {"preset": "fast", "crf": 23, "height": 1080, "fps": None, "realtime": None},
+    "archive": {"preset": "slow", "crf": 19, "height": None, "fps": None, "realtime": None},
+}
+
+# Hızlıdan yavaşa; medium = 1.0 kabul edilen yaklaşık göreli hız
+X264_PRESET_SPEED = {
+    "ultrafast": 8.0, "superfast": 5.5, "veryfast": 4.0, "faster": 2.4,
+    "fast": 1.6, "medium": 1.0, "slow": 0.6,
+}
+FALLBACK_HEIGHTS = [720, 540, 360]
+
+
+def probe_video_stream(video_path):
+    # (genişlik, yükseklik, fps); okunamazsa None (çağıran karar verir, varsayım yok)
+    result = tracing.run([
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,r_frame_rate",
+        "-of", "csv=p=0",
+        video_path
+    ], capture_output=True, text=True)
+
+    try:
+        width, height, rate = result.stdout.strip().split(",")[:3]
+        num, _, den = rate.partition("/")
+        return int(width), int(height), float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def estimate_encode_seconds(duration, width, height, fps, preset, threads, base_fps=None):
+    # Kaba model: piksel sayısıyla ters, preset hızıyla doğru, thread'lerle alt-doğrusal orantılı
+    base_fps = base_fps or RENDER_BASE_FPS
+    speed = base_fps * X264_PRESET_SPEED[preset] * threads ** 0.85 * (1920 * 1080) / (width * height)
+    return duration * fps / speed
+
+
+def render_settings(duration, width, height, fps, profile=None, budget=None, cores=None):
+    """
+    Profil + klip süresi + çekirdek sayısından encode ayarı. Süre sınırı (budget ya da
+    profilin realtime katsayısı) aşılacaksa önce preset hızlandırılır, yetmezse çözünürlük
+    düşürülür. Dönüş: profile, preset, crf, width, height, fps, threads, estimated_sec
+
+    Kaynak okunamadıysa (width/height None) tahmin yapılmaz: profilin preset'i ve
+    yükseklik sınırı aynen kullanılır (width / estimated_sec None, ölçek ifadeyle).
+    """
+    name = profile or RENDER_PROFILE
+    config = RENDER_PROFILES.get(name, RENDER_PROFILES["standard"])
+
+    # Aynı süreçte başka ffmpeg'ler de çalışıyorsa çekirdekler paylaşılır
+    cores = cores or os.cpu_count() or 1
+    threads = max(1, cores // (slots.in_use() + 1))
+
+    if not width or not height:
+        return {
+            "profile": name,
+            "preset": config["preset"],
+            "crf": config["crf"],
+            "width": None,
+            "height": config["height"],
+            # Kaynak fps bilinmiyor: sabit fps filtresi düşük fps'li klibi çoğaltabilirdi
+            "fps": None,
+            "scaled": bool(config["height"]),
+            "resampled": False,
+            "threads": threads,
+            "estimated_sec": None,
+        }
+
+    out_height = min(height, config["height"]) if config["height"] else height
+    out_fps = min(fps, config["fps"]) if config["fps"] else fps
+
+    limits = [b for b in (budget if budget is not None else RENDER_BUDGET,
+                          config["realtime"] and config["realtime"] * duration) if b]
+    limit = min(limits) if limits else None
+
+    presets = list(X264_PRESET_SPEED)
+    preset = config["preset"]
+
+    def estimate():
+        out_width = round(width * out_height / height / 2) * 2
+        return out_width, estimate_encode_seconds(duration, out_width, out_height, out_fps, preset, threads)
+
+    out_width, estimated = estimate()
+
+    while limit and estimated > limit:
+        if presets.index(preset) > 0:
+            preset = presets[presets.index(preset) - 1]
+        else:
+            lower = [h for h in FALLBACK_HEIGHTS if h < out_height]
+            if not lower:
+                break
+            out_height = lower[0]
+        out_width, estimated = estimate()
+
+    return {
+        "profile": name,
+        "preset": preset,
+        "crf": config["crf"],
+        "width": out_width,
+        "height": out_height,
+        "fps": out_fps,
+        "scaled": out_height != height,
+        "resampled": out_fps != fps,
+        "threads": threads,
+        "estimated_sec": round(estimated, 1),
+    }
+
+
+def encode_args(settings):
+    # render_settings → libx264 argümanları (gerekirse scale / fps filtresi)
+    filters = []
+    if settings["scaled"] and settings["width"] is None:
+        # Kaynak boyutu bilinmiyor: sadece sınırın üstündekiler küçültülür
+        filters.append(f"scale=-2:'min(ih,{settings['height']})'")
+    elif settings["scaled"]:
+        filters.append(f"scale=-2:{settings['height']}")
+    if settings["resampled"]:
+        filters.append(f"fps={settings['fps']:g}")
+
+    args = ["-c:v", "libx264", "-preset", settings["preset"], "-crf", str(settings["crf"]),
+            "-threads", str(settings["threads"])]
+    return (["-vf", ",".join(filters)] if filters else []) + args
 
 
 # ============================================
 # VİDEO KIRP
 # ============================================
 
-def trim_video(video_path, duration, output_path):
+# copy  : stream copy, -t ile ses süresinde kesilir (baştan başladığı için keyframe gerekmez)
+# exact : son keyframe'e kadar copy + kesim noktasındaki kısa GOP kaynakla uyumlu yeniden encode
+# encode: eski davranış, tüm video libx264 ile yeniden encode (_cut içinde, profil + bütçe ile)
+TRIM_MODE = os.environ.get("TRIM_MODE", "copy")
+
+# Kaynak codec → kesim parçası için aynı codec encoder'ı
+TAIL_ENCODERS = {
+    "h264": ["-c:v", "libx264", "-preset", "fast", "-crf", "20"],
+    "vp9": ["-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8", "-crf", "30", "-b:v", "0"],
+}
+
+
+def run_ffmpeg(cmd):
+    with span("ffmpeg", output=cmd[-1]), cpu_slot():
+        result = tracing.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        logger.warning(f"⚠️ ffmpeg hata: {result.stderr[-300:]}")
+    return result
+
+
+# ffprobe profil adı → libx264 -profile:v (High 10 / 4:2:2 gibi diğerleri için parça encode edilmez)
+H264_PROFILES = {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high"}
+
+
+def probe_video_codec(video_path):
+    # codec_name, profile, level, pix_fmt; okunamazsa None
+    result = tracing.run([
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,profile,level,pix_fmt",
+        "-of", "json",
+        video_path
+    ], capture_output=True, text=True)
+
     try:
-        logger.info(f"✂️ Video kırpılıyor: {duration:.2f} saniye")
+        return json.loads(result.stdout)["streams"][0]
+    except (ValueError, KeyError, IndexError):
+        return None
 
-        cmd = [
-            "ffmpeg", "-y",
-            "-i", video_path,
-            "-t", str(duration),
-            "-c:v", "libx264",
-            "-preset", "fast",
-            "-crf", "23",
-            "-c:a", "aac",
-            "-b:a", "128k",
-            output_path
-        ]
 
-        result = subprocess.run(cmd, capture_output=True, text=True)
+def tail_encoder(stream):
+    """
+    Kesim parçasının copy edilen baş kısımla aynı akışa eklenebilmesi için encoder
+    argümanları; desteklenmiyorsa None. h264'te profil / level / piksel formatı kaynağa
+    eşitlenir ve SPS/PPS her keyframe'de in-band tekrarlanır: concat copy çıktıya baş
+    kısmın başlıklarını yazsa da decoder parçanın kendi başlıklarına geçer.
+    """
+    codec = stream and stream.get("codec_name")
+    if codec not in TAIL_ENCODERS:
+        return None
 
-        if result.returncode == 0 and os.path.exists(output_path):
+    args = list(TAIL_ENCODERS[codec])
+    if stream.get("pix_fmt"):
+        args += ["-pix_fmt", stream["pix_fmt"]]
+
+    if codec == "h264":
+        profile = H264_PROFILES.get(stream.get("profile"))
+        if not profile:
+            return None
+        args += ["-profile:v", profile, "-x264-params", "repeat-headers=1"]
+        if (stream.get("level") or 0) > 0:
+            args += ["-level", f"{stream['level'] / 10:g}"]
+
+    return args
+
+
+def probe_keyframes(video_path, around, window=30):
+    # Paket bayraklarından keyframe zamanları (decode yok, hızlı)
+    start = max(0.0, around - window)
+    result = tracing.run([
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-read_intervals", f"{start}%{around + window}",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        video_path
+    ], capture_output=True, text=True)
+
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            keyframes.append(float(pts))
+
+    return sorted(keyframes)
+
+
+def _input_args(source):
+    # URL ise ffmpeg doğrudan HTTP'den okur (gerektiğinde Range ile atlar),
+    # -t dolunca okumayı bırakır; bağlantı koparsa kaldığı yerden bağlanır
+    if source.startswith(("http://", "https://")):
+        return ["-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "5", "-i", source]
+    return ["-i", source]
+
+
+def _cut_cmd(input_args, video_args, output_path, audio_path=None):
+    # audio_path verilirse kırpma + ses ekleme + faststart tek ffmpeg çağrısında
+    cmd = ["ffmpeg", "-y", *input_args]
+    if audio_path:
+        cmd += ["-i", audio_path]
+
+    cmd += ["-map", "0:v:0", *video_args]
+
+    if audio_path:
+        cmd += ["-map", "1:a:0", "-c:a", "aac", "-b:a", "192k", "-shortest", "-movflags", "+faststart"]
+    else:
+        cmd += ["-an"]
+
+    return cmd + [output_path]
+
+
+def _trim_encode(video_path, duration, output_path, audio_path=None, profile=None, budget=None):
+    stream = probe_video_stream(video_path)
+    if stream is None:
+        settings = render_settings(duration, None, None, None, profile, budget)
+        logger.warning(
+            f"⚠️ Video akışı okunamadı, süre tahmini yok; profil {settings['profile']} "
+            f"({settings['preset']} crf {settings['crf']}, en fazla {settings['height'] or 'kaynak'}p) aynen uygulanıyor"
+        )
+    else:
+        settings = render_settings(duration, *stream, profile, budget)
+        logger.info(
+            f"🎛️ Profil {settings['profile']}: {settings['preset']} crf {settings['crf']}, "
+            f"{settings['width']}x{settings['height']} @ {settings['fps']:g} fps, {settings['threads']} thread "
+            f"(tahmini {settings['estimated_sec']:.0f} sn)"
+        )
+
+    return run_ffmpeg(_cut_cmd(
+        _input_args(video_path),
+        ["-t", str(duration), *encode_args(settings)],
+        output_path, audio_path
+    )).returncode == 0
+
+
+def _trim_copy(video_path, duration, output_path, audio_path=None):
+    # Stream copy; baştan kesildiği için ilk frame keyframe, -t ses süresinde bırakır
+    return run_ffmpeg(_cut_cmd(
+        _input_args(video_path),
+        ["-t", f"{duration:.3f}", "-c:v", "copy"],
+        output_path, audio_path
+    )).returncode == 0
+
+
+def _trim_exact(video_path, duration, output_path, audio_path=None):
+    stream = probe_video_codec(video_path)
+    encoder = tail_encoder(stream)
+    before = [k for k in probe_keyframes(video_path, duration) if k <= duration]
+
+    if not encoder or not before:
+        codec = stream and "/".join(str(stream.get(k)) for k in ("codec_name", "profile"))
+        logger.info(f"ℹ️ Exact kesim desteklenmiyor (codec: {codec}), tam encode")
+        return _trim_encode(video_path, duration, output_path, audio_path)
+
+    keyframe = before[-1]
+    tail_len = duration - keyframe
+
+    if tail_len < 0.05:
+        return _trim_copy(video_path, keyframe, output_path, audio_path)
+
+    logger.info(f"🔑 {keyframe:.2f} sn'ye kadar copy, son {tail_len:.2f} sn {stream['codec_name']} encode")
+
+    base = os.path.splitext(output_path)[0]
+    head, tail, concat_list = f"{base}.head.mp4", f"{base}.tail.mp4", f"{base}.concat.txt"
+
+    try:
+        ok = run_ffmpeg([
+            "ffmpeg", "-y", *_input_args(video_path),
+            "-t", f"{keyframe:.3f}", "-map", "0:v:0", "-c", "copy", "-an", head
+        ]).returncode == 0
+
+        ok = ok and run_ffmpeg([
+            "ffmpeg", "-y", "-ss", f"{keyframe:.3f}", *_input_args(video_path),
+            "-t", f"{tail_len:.3f}", "-map", "0:v:0", *encoder, "-an", tail
+        ]).returncode == 0
+
+        if not ok:
+            return False
+
+        with open(concat_list, "w", encoding="utf-8") as f:
+            f.write(f"file '{os.path.abspath(head)}'\nfile '{os.path.abspath(tail)}'\n")
+
+        return run_ffmpeg(_cut_cmd(
+            ["-f", "concat", "-safe", "0", "-i", concat_list],
+            ["-c:v", "copy"],
+            output_path, audio_path
+        )).returncode == 0
+
+    finally:
+        for f in (head, tail, concat_list):
+            if os.path.exists(f):
+                os.remove(f)
+
+
+TRIMMERS = {"copy": _trim_copy, "exact": _trim_exact}
+
+
+def _cut(video_path, duration, output_path, mode, audio_path=None, profile=None, budget=None):
+    if mode == "encode":
+        ok = _trim_encode(video_path, duration, output_path, audio_path, profile, budget)
+    else:
+        ok = TRIMMERS.get(mode, _trim_copy)(video_path, duration, output_path, audio_path)
+
+    if not ok and mode != "encode":
+        logger.warning("⚠️ Stream copy kırpma başarısız, tam encode deneniyor")
+        ok = _trim_encode(video_path, duration, output_path, audio_path, profile, budget)
+
+    return ok and os.path.exists(output_path)
+
+
+def trim_video(video_path, duration, output_path, mode=None, profile=None, budget=None):
+    mode = mode or TRIM_MODE
+
+    try:
+        logger.info(f"✂️ Video kırpılıyor: {duration:.2f} saniye (mod: {mode}, kaynak ses atılıyor)")
+
+        with span("trim", mode=mode, profile=profile or RENDER_PROFILE):
+            ok = _cut(video_path, duration, output_path, mode, profile=profile, budget=budget)
+
+        if ok:
             logger.info("✅ Video kırpıldı")
             return True
 
-        logger.error(f"❌ Video kırpma hatası: {result.stderr[:300]}")
+        logger.error("❌ Video kırpma hatası")
         return False
 
     except Exception as e:
@@ -355,6 +1183,176 @@ def trim_video(video_path, duration, output_path):
         return False
 
 
+# ============================================
+# TEK GEÇİŞ RENDER (KIRP + SES + FASTSTART)
+# ============================================
+
+def render_video(video_path, audio_path, duration, output_path, mode=None, profile=None, budget=None):
+    # trim_video + merge_audio_video yerine: ara trimmed_*.mp4 yok, tek ffmpeg
+    mode = mode or TRIM_MODE
+
+    try:
+        logger.info(f"🎬 Tek geçiş render: {duration:.2f} saniye (mod: {mode})")
+
+        if _cut(video_path, duration, output_path, mode, audio_path, profile, budget):
+            logger.info("✅ Video kırpıldı + ses birleştirildi")
+            return True
+
+        logger.error("❌ Render hatası")
+        return False
+
+    except Exception as e:
+        logger.error(f"❌ Render exception: {e}")
+        return False
+
+
+# ============================================
+# MONTAJ (SES FRAGMANDAN UZUNSA)
+# ============================================
+
+MONTAGE_MARGIN = 0.5   # sn; görüntü sesten önce bitmesin
+
+
+def video_duration(source):
+    # MP4 ise mvhd'den (süreç yok), değilse (webm / link) ffprobe; okunamazsa None
+    if not source.startswith(("http://", "https://")):
+        duration = mp4_duration(source)
+        if duration:
+            return duration
+
+    result = tracing.run([
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        source
+    ], capture_output=True, text=True)
+
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def probe_video_format(video_path):
+    # Stream copy concat için parçalarda aynı olması gereken alanlar
+    result = tracing.run([
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,width,height,r_frame_rate,pix_fmt",
+        "-of", "json",
+        video_path
+    ], capture_output=True, text=True)
+
+    try:
+        stream = json.loads(result.stdout)["streams"][0]
+    except (ValueError, KeyError, IndexError):
+        return None
+
+    return {key: stream.get(key) for key in ("codec_name", "width", "height", "r_frame_rate", "pix_fmt")}
+
+
+def plan_montage(clips, duration):
+    """
+    clips: [(yol, süre)] öncelik sırasıyla. Ses süresi kapanana kadar klipler sırayla
+    eklenir; hepsi yetmezse baştan tekrar edilir. [(yol, süre)] döner.
+    """
+    usable = [(path, length) for path, length in clips if length and length > 0]
+    plan = []
+    covered = 0.0
+
+    while usable and covered < duration + MONTAGE_MARGIN:
+        for path, length in usable:
+            plan.append((path, length))
+            covered += length
+            if covered >= duration + MONTAGE_MARGIN:
+                break
+
+    return plan
+
+
+def _remux_segment(path, output, limit):
+    # Sadece video stream'i: concat demuxer tüm dosyalarda aynı stream düzenini ister
+    return run_ffmpeg([
+        "ffmpeg", "-y", "-i", path, "-t", f"{limit:.3f}", "-map", "0:v:0", "-c", "copy", "-an", output
+    ]).returncode == 0
+
+
+def _normalize_segment(path, reference, output, limit):
+    # Referans parçanın codec / çözünürlük / fps / piksel formatına yeniden encode
+    width, height = reference["width"], reference["height"]
+    filters = (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+        f"fps={reference['r_frame_rate']},format={reference['pix_fmt']}"
+    )
+
+    return run_ffmpeg([
+        "ffmpeg", "-y", "-i", path, "-t", f"{limit:.3f}", "-map", "0:v:0",
+        "-vf", filters, *TAIL_ENCODERS[reference["codec_name"]], "-an", output
+    ]).returncode == 0
+
+
+def render_montage(clips, audio_path, duration, output_path):
+    """
+    Birden fazla klipten ses süresini kapatan video + ses, tek çıktı.
+    İlk klibin formatı referanstır: aynı formattaki klipler sadece remux edilir,
+    farklı olanlar (codec / çözünürlük / fps) referansa encode edilir; sonra
+    concat demuxer ile stream copy. Referans codec'in encoder'ı yoksa hepsi h264.
+    """
+    plan = plan_montage(clips, duration)
+    reference = probe_video_format(plan[0][0]) if plan else None
+    if not reference or not reference["width"] or not reference["height"]:
+        logger.error("❌ Montaj: klip formatı okunamadı")
+        return False
+
+    if reference["codec_name"] not in TAIL_ENCODERS:
+        reference = {**reference, "codec_name": "h264", "pix_fmt": "yuv420p"}
+
+    lengths = dict(plan)
+    base = os.path.splitext(output_path)[0]
+    concat_list = f"{base}.montage.txt"
+    segments = {}
+    normalized = 0
+
+    try:
+        with span("montage", clips=len(plan)) as s:
+            for i, path in enumerate(lengths):
+                segment = f"{base}.seg{i}.mkv"
+                segments[path] = segment
+
+                # Ses süresinden uzun klibin fazlası kopyalanmaz / encode edilmez
+                limit = min(lengths[path], duration + MONTAGE_MARGIN)
+
+                if probe_video_format(path) == reference:
+                    ok = _remux_segment(path, segment, limit)
+                else:
+                    normalized += 1
+                    ok = _normalize_segment(path, reference, segment, limit)
+
+                if not ok:
+                    return False
+
+            s.meta["normalized"] = normalized
+            logger.info(f"🎞️ Montaj: {len(plan)} parça ({len(segments)} klip), {normalized} klip yeniden encode")
+
+            with open(concat_list, "w", encoding="utf-8") as f:
+                for path, _ in plan:
+                    f.write(f"file '{os.path.abspath(segments[path])}'\n")
+
+            ok = run_ffmpeg(_cut_cmd(
+                ["-f", "concat", "-safe", "0", "-i", concat_list],
+                ["-t", f"{duration + MONTAGE_MARGIN:.3f}", "-c:v", "copy"],
+                output_path, audio_path
+            )).returncode == 0
+
+        return ok and os.path.exists(output_path)
+
+    finally:
+        for f in [concat_list, *segments.values()]:
+            if os.path.exists(f):
+                os.remove(f)
+
+
 # ============================================
 # SES İLE BİRLEŞTİR
 # ============================================
@@ -377,7 +1375,8 @@ def merge_audio_video(video_path, audio_path, output_path):
             output_path
         ]
 
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        with span("merge"), cpu_slot():
+            result = tracing.run(cmd, capture_output=True, text=True)
 
         if result.returncode == 0 and os.path.exists(output_path):
             logger.info("✅ Ses birleştirildi")
@@ -399,16 +1398,23 @@ def upload_to_callback(callback_url, film_id, final_video_path):
     try:
         logger.info(f"📡 Callback gönderiliyor: {callback_url}")
 
-        with open(final_video_path, "rb") as f:
-            files = {"video": (f"fragman_{film_id}.mp4", f, "video/mp4")}
-            data = {"film_id": film_id, "status": "success"}
+        current_span().add_bytes(os.path.getsize(final_video_path))
 
-            response = requests.post(callback_url, files=files, data=data, timeout=300)
+        response = upload_file(
+            callback_url,
+            final_video_path,
+            "video",
+            filename=f"fragman_{film_id}.mp4",
+            content_type="video/mp4",
+            data={"film_id": film_id, "status": "success"},
+            session=http_session,
+            log=logger.info
+        )
 
         logger.info(f"📡 Callback status: {response.status_code}")
         logger.info(f"📡 Callback cevap: {response.text[:200]}")
 
-        return response.status_code == 200
+        return upload_ok(response)
 
     except Exception as e:
         logger.error(f"❌ Callback upload hatası: {e}")
@@ -416,24 +1422,199 @@ def upload_to_callback(callback_url, film_id, final_video_path):
 
 
 # ============================================
-# MAIN
+# AŞAMA GRAFİĞİ
 # ============================================
 
-def main():
-    logger.info("=" * 70)
-    logger.info("🚀 SADECE RAPIDAPI FRAGMAN SİSTEMİ BAŞLADI")
-    logger.info("=" * 70)
+class StageError(Exception):
+    pass
 
-    try:
-        event_path = os.environ.get("GITHUB_EVENT_PATH")
 
-        if not event_path or not os.path.exists(event_path):
-            logger.error("❌ GITHUB_EVENT_PATH yok. Bu sistem GitHub Actions payload ister.")
-            return False
+def require(ok, message):
+    # Eski True/False dönen fonksiyonları aşama hatasına çevirir
+    if not ok:
+        raise StageError(message)
+    return ok
+
+
+class StageGraph:
+    """
+    Bağımlılıkları hazır olan aşamalar paralel çalışır.
+    Aşama fonksiyonu: func(results, cancel) → sonuç (hata = exception).
+    Bir aşama hata verirse cancel event'i set edilir, diğerleri erken biter.
+
+    checkpoint verilirse outputs'u tanımlı aşamalar kaydedilir ve yeniden denemede atlanır:
+    - outputs: aşamanın ürettiği dosyalar (liste ya da sonuç → liste; None dönerse kaydedilmez)
+    - key: results → aşamanın geçerlilik anahtarı (varsayılan: bağımlılıkların sonuçları)
+    - ttl: sonuç süreli geçerliyse (örn. RapidAPI linki) saniye
+    """
+
+    def __init__(self, max_workers=4, checkpoint=None):
+        self.max_workers = max_workers
+        self.checkpoint = checkpoint
+        self.stages = {}
+        self.policies = {}
+        self.timings = {}
+        self.cancel = threading.Event()
+
+    def add(self, name, func, deps=(), outputs=None, key=None, ttl=None):
+        self.stages[name] = (func, tuple(deps))
+        if outputs is not None:
+            self.policies[name] = (outputs, key, ttl)
+
+    def _run_stage(self, name, func, results):
+        started = time.monotonic()
+        policy = self.policies.get(name) if self.checkpoint else None
+
+        try:
+            with span(name) as s:
+                if policy is None:
+                    return func(results, self.cancel)
+
+                outputs, key, ttl = policy
+                stage_key = key(results) if key else {dep: results[dep] for dep in self.stages[name][1]}
+
+                entry = self.checkpoint.lookup(name, stage_key)
+                if entry is not None:
+                    logger.info(f"⏭️ {name}: checkpoint'ten devam")
+                    s.meta["resumed"] = True
+                    return entry["result"]
+
+                result = func(results, self.cancel)
+
+                files = outputs(result) if callable(outputs) else outputs
+                if files is not None:
+                    self.checkpoint.done(name, result, files, stage_key, ttl)
+                return result
+        finally:
+            self.timings[name] = (started, time.monotonic())
+
+    def run(self):
+        results = {}
+        pending = dict(self.stages)
+        running = {}
+        self.t0 = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name in list(pending):
+                    func, deps = pending[name]
+                    if all(dep in results for dep in deps):
+                        del pending[name]
+                        # Aktif tracer aşama thread'ine taşınsın
+                        context = contextvars.copy_context()
+                        running[pool.submit(context.run, self._run_stage, name, func, dict(results))] = name
+
+                if not running:
+                    raise StageError(f"Çözülemeyen bağımlılık: {', '.join(pending)}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        logger.error(f"❌ Aşama başarısız: {name} → {e}")
+                        self.cancel.set()
+                        wait(running)
+                        raise
+
+        return results
+
+    def critical_path(self):
+        # Son biten aşamadan geriye: her adımda en geç biten bağımlılık
+        if not self.timings:
+            return []
+
+        name = max(self.timings, key=lambda n: self.timings[n][1])
+        path = [name]
+
+        while True:
+            deps = [d for d in self.stages[name][1] if d in self.timings]
+            if not deps:
+                break
+            name = max(deps, key=lambda d: self.timings[d][1])
+            path.append(name)
+
+        return list(reversed(path))
+
+    def log_timings(self):
+        critical = set(self.critical_path())
+        logger.info("⏱️ Aşama süreleri (başlangıç → bitiş, * kritik yol):")
+
+        for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            mark = "*" if name in critical else " "
+            logger.info(f"   {mark} {name:<10} {start - self.t0:7.1f} → {end - self.t0:7.1f} sn  ({end - start:.1f} sn)")
+
+        logger.info(f"🧭 Kritik yol: {' → '.join(self.critical_path())}")
+
+
+# ============================================
+# SES İNDİR
+# ============================================
+
+def download_audio(ses_url, audio_file):
+    # Bellekte tam kopya yok: parça parça diske yazılır, süre baytlar gelirken hesaplanır
+    logger.info("📥 Ses indiriliyor...")
+
+    parser = Mp3Duration()
+    digest = hashlib.sha256()
+    part = f"{audio_file}.part"
+
+    with http_session.get(ses_url, timeout=120, stream=True) as r:
+        if r.status_code != 200:
+            raise StageError(f"Ses indirilemedi: HTTP {r.status_code}")
+
+        with open(part, "wb") as f:
+            for chunk in r.iter_content(64 * 1024):
+                f.write(chunk)
+                parser.feed(chunk)
+                digest.update(chunk)
+                current_span().add_bytes(len(chunk))
+
+    if parser.total < 5000:
+        os.remove(part)
+        raise StageError("Ses dosyası bozuk veya çok küçük")
 
-        event = json.load(open(event_path, encoding="utf-8"))
-        payload = event.get("client_payload", {})
+    os.replace(part, audio_file)
 
+    logger.info(f"✅ Ses indirildi: {audio_file} ({parser.total / 1024:.0f} KB)")
+    # sha256: checkpoint'te render'ın aynı sesle yapılıp yapılmadığı buna bakar
+    return {**parser.result(), "sha256": digest.hexdigest()}
+
+
+def resolve_youtube_ids(tmdb_id, tmdb_key):
+    # [asıl fragman, montaj adayları...]
+    youtube_urls = get_youtube_urls_from_tmdb(tmdb_id, tmdb_key)
+    if not youtube_urls:
+        raise StageError("TMDB fragman YouTube URL bulunamadı")
+
+    logger.info(f"🔗 Fragman URL: {youtube_urls[0]}")
+
+    youtube_id = extract_video_id(youtube_urls[0])
+    if not youtube_id:
+        raise StageError("YouTube ID çıkarılamadı")
+
+    logger.info(f"🆔 YouTube ID: {youtube_id}")
+
+    extras = [extract_video_id(url) for url in youtube_urls[1:]]
+    return [youtube_id, *[e for e in extras if e and e != youtube_id]]
+
+
+# ============================================
+# MAIN
+# ============================================
+
+def run_job(payload):
+    """
+    Tek film işler (payload = repository_dispatch client_payload).
+    GitHub Actions'tan da worker.py'den de aynı şekilde çağrılır; başarıda True.
+    """
+    graph = None
+    tracer = None
+    work_files = []
+
+    try:
         film_id = payload.get("film_id")
         tmdb_id = payload.get("tmdb_id")
         film_adi = payload.get("film_adi")
@@ -454,96 +1635,197 @@ def main():
             logger.error("❌ TMDB_API_KEY yok")
             return False
 
-        # 1) TMDB -> YouTube URL bul
-        youtube_url = get_youtube_url_from_tmdb(tmdb_id, TMDB_KEY)
-        if not youtube_url:
-            logger.error("❌ TMDB fragman YouTube URL bulunamadı")
-            return False
-
-        logger.info(f"🔗 Fragman URL: {youtube_url}")
-
-        # 2) YouTube ID çıkar
-        youtube_id = extract_video_id(youtube_url)
-        if not youtube_id:
-            logger.error("❌ YouTube ID çıkarılamadı")
-            return False
-
-        logger.info(f"🆔 YouTube ID: {youtube_id}")
-
-        # 3) Ses indir
-        audio_file = f"audio_{film_id}.mp3"
-        logger.info("📥 Ses indiriliyor...")
-
-        r = requests.get(ses_url, timeout=120)
-        if r.status_code != 200:
-            logger.error(f"❌ Ses indirilemedi: HTTP {r.status_code}")
-            return False
-
-        with open(audio_file, "wb") as f:
-            f.write(r.content)
-
-        if not os.path.exists(audio_file) or os.path.getsize(audio_file) < 5000:
-            logger.error("❌ Ses dosyası bozuk veya çok küçük")
-            return False
-
-        logger.info(f"✅ Ses indirildi: {audio_file}")
-
-        # 4) Ses süresi
-        audio_duration = get_audio_duration(audio_file)
-
-        # 5) RapidAPI ile video indir
-        raw_video = f"raw_{film_id}.mp4"
-        if not download_via_rapidapi_fast(youtube_id, raw_video):
-            logger.error("❌ RapidAPI video indirilemedi")
-            return False
+        # Ara dosyalar checkpoint klasöründe: geç aşamada (render / callback) düşen iş
+        # yeniden denenince TMDB + RapidAPI beklemesi + render tekrarlanmaz
+        checkpoint = Checkpoint("fragman", film_id, {
+            "tmdb_id": tmdb_id, "ses_url": ses_url, "video_source": VIDEO_SOURCE, "trim_mode": TRIM_MODE,
+            "render_profile": RENDER_PROFILE,
+        })
+        if checkpoint.resumed:
+            logger.info(f"♻️ Checkpoint bulundu: {', '.join(checkpoint.stages)}")
+
+        audio_file = checkpoint.path(f"audio_{film_id}.mp3")
+        raw_video = checkpoint.path(f"raw_{film_id}.mp4")
+        final_video = checkpoint.path(f"final_{film_id}.mp4")
+        work_files = [f"{audio_file}.part"]
+
+        # Ses (indir + süre) ile video (TMDB + RapidAPI) birbirinden bağımsız, paralel koşar.
+        # Ses her seferinde indirilir (aynı URL'de yeni seslendirme olabilir); render'ın
+        # checkpoint anahtarında sesin sha256'sı var
+        graph = StageGraph(checkpoint=checkpoint)
+
+        # [asıl fragman, montaj adayları...]
+        graph.add("resolve", lambda r, c: resolve_youtube_ids(tmdb_id, TMDB_KEY), outputs=[])
+        graph.add("audio", lambda r, c: download_audio(ses_url, audio_file))
+        graph.add("probe", lambda r, c: get_audio_duration(audio_file, r["audio"]), deps=["audio"])
+
+        def fetch_video(r, c):
+            # Daha önce indirilmiş fragman varsa render doğrudan cache dosyasından okur
+            cached = cached_trailer(r["resolve"][0])
+            if cached:
+                return cached
+
+            if VIDEO_SOURCE == "stream":
+                logger.info("🌊 Video akış modunda: ffmpeg linkten doğrudan okuyacak")
+                return require(resolve_video_url(r["resolve"][0], cancel=c), "RapidAPI video linki alınamadı")
+
+            require(download_via_rapidapi_fast(r["resolve"][0], raw_video, cancel=c), "RapidAPI video indirilemedi")
+            return raw_video
+
+        def is_link(source):
+            return source.startswith(("http://", "https://"))
+
+        graph.add("download", fetch_video, deps=["resolve"],
+                  outputs=lambda source: [] if is_link(source) else [source], ttl=VIDEO_LINK_TTL)
+
+        def fill_cache(r, c):
+            # Sadece akış modunda ve TRAILER_CACHE_FILL=1 ise: render bitince link cache'e
+            # indirilir (upload ile paralel, ama iş indirme bitene kadar kapanmaz); hata işi bozmaz
+            if not TRAILER_CACHE_FILL or not is_link(r["download"]):
+                return None
+            try:
+                return fill_trailer_cache(r["resolve"][0], r["download"], f"cache_{film_id}.mp4", c)
+            except Exception as e:
+                logger.warning(f"⚠️ Fragman cache doldurulamadı: {str(e)[:150]}")
+                return None
+
+        graph.add("cache", fill_cache, deps=["download", "render"])
+
+        def fetch_extras(r, c):
+            # Ses asıl fragmandan uzunsa (eskiden -shortest sesi kesiyordu) diğer TMDB
+            # videoları paralel indirilir; montaj klipleri [(yol, süre)], gerekmiyorsa [].
+            # Montajla aynı ölçü: görüntü sesi MONTAGE_MARGIN kadar aşmalı
+            trailer_length = video_duration(r["download"])
+            if trailer_length is None or trailer_length >= r["probe"] + MONTAGE_MARGIN:
+                return []
+
+            if len(r["resolve"]) < 2:
+                logger.warning(f"⚠️ Fragman ({trailer_length:.1f} sn) sesten ({r['probe']:.1f} sn) kısa, "
+                               "montaj adayı yok; fragman tekrar edilecek")
+            else:
+                logger.info(f"🎞️ Ses ({r['probe']:.1f} sn) fragmandan ({trailer_length:.1f} sn) uzun, "
+                            f"montaj için {len(r['resolve']) - 1} video indiriliyor")
+
+            primary = r["download"]
+            if is_link(primary):
+                # Montaj yerel dosyalarla yapılır
+                require(download_file(primary, raw_video, c), "Video indirilemedi")
+                store_trailer(r["resolve"][0], raw_video)
+                primary = raw_video
+
+            def fetch(i, youtube_id):
+                try:
+                    path = cached_trailer(youtube_id)
+                    if path:
+                        return path
+                    path = checkpoint.path(f"extra{i}_{film_id}.mp4")
+                    return path if download_via_rapidapi_fast(youtube_id, path, cancel=c) else None
+                except Exception as e:
+                    logger.warning(f"⚠️ Montaj klibi alınamadı ({youtube_id}): {str(e)[:150]}")
+                    return None
+
+            extras = r["resolve"][1:]
+            paths = []
+            if extras:
+                with ThreadPoolExecutor(max_workers=len(extras)) as pool:
+                    futures = [pool.submit(contextvars.copy_context().run, fetch, i, youtube_id)
+                               for i, youtube_id in enumerate(extras, 1)]
+                    paths = [future.result() for future in futures]
+
+            return [[primary, trailer_length]] + [[path, video_duration(path)] for path in paths if path]
+
+        graph.add("extras", fetch_extras, deps=["download", "probe"],
+                  outputs=lambda clips: [path for path, _ in clips], key=lambda r: [r["resolve"], r["probe"]])
+
+        def render(r, c):
+            if r["extras"]:
+                require(render_montage(r["extras"], audio_file, r["probe"], final_video), "Montaj render edilemedi")
+                return final_video
+
+            source = r["download"]
+            ok = render_video(source, audio_file, r["probe"], final_video)
+
+            if not ok and is_link(source):
+                logger.warning("⚠️ Akıştan render başarısız, video diske indirilip tekrar deneniyor")
+                require(download_file(source, raw_video, c), "Video indirilemedi")
+                store_trailer(r["resolve"][0], raw_video)
+                ok = render_video(raw_video, audio_file, r["probe"], final_video)
+
+            require(ok, "Video render edilemedi")
+
+            file_size = os.path.getsize(final_video) / (1024 * 1024)
+            logger.info(f"🎉 Final video hazır: {file_size:.1f} MB")
+            return final_video
+
+        # Link ya da cache yolu değişse de aynı fragman + aynı ses = aynı çıktı
+        graph.add("render", render, deps=["download", "probe", "extras"], outputs=[final_video],
+                  key=lambda r: [r["resolve"], r["audio"]["sha256"], r["probe"]])
+
+        graph.add("upload", lambda r, c: require(
+            upload_to_callback(callback, film_id, final_video),
+            "Callback başarısız"
+        ), deps=["render"])
+
+        tracer = Tracer("fragman", film_id, tmdb_id=tmdb_id, video_source=VIDEO_SOURCE, trim_mode=TRIM_MODE,
+                        render_profile=RENDER_PROFILE)
+        with tracer.activate():
+            graph.run()
+
+        checkpoint.clear()
 
-        # 6) Video kırp (ses süresi kadar)
-        trimmed_video = f"trimmed_{film_id}.mp4"
-        if not trim_video(raw_video, audio_duration, trimmed_video):
-            logger.error("❌ Video kırpılamadı")
-            return False
+        logger.info("✅ Callback başarılı!")
+        logger.info("=" * 70)
+        logger.info("✅ SİSTEM TAMAMLANDI")
+        logger.info("=" * 70)
 
-        # 7) Ses + video birleştir
-        final_video = f"final_{film_id}.mp4"
-        if not merge_audio_video(trimmed_video, audio_file, final_video):
-            logger.error("❌ Video + ses birleştirilemedi")
-            return False
+        return True
 
-        if not os.path.exists(final_video):
-            logger.error("❌ Final video oluşmadı")
-            return False
+    except StageError as e:
+        logger.error(f"❌ {e}")
+        return False
 
-        file_size = os.path.getsize(final_video) / (1024 * 1024)
-        logger.info(f"🎉 Final video hazır: {file_size:.1f} MB")
+    except Exception as e:
+        logger.error(f"❌ MAIN HATA: {e}", exc_info=True)
+        return False
 
-        # 8) Callback upload
-        ok = upload_to_callback(callback, film_id, final_video)
-        if not ok:
-            logger.error("❌ Callback başarısız")
-            return False
+    finally:
+        if graph is not None:
+            graph.log_timings()
 
-        logger.info("✅ Callback başarılı!")
+        if tracer is not None:
+            try:
+                logger.info(f"🧾 Trace: {tracer.write()}")
+            except OSError as e:
+                logger.warning(f"⚠️ Trace yazılamadı: {e}")
 
-        # 9) Temizlik
+        # Temizlik (hata olsa da; worker modunda süreç kapanmıyor). Checkpoint klasörü
+        # başarıda silinir, hatada sonraki deneme için kalır
         logger.info("🧹 Temizlik yapılıyor...")
 
-        for f in [audio_file, raw_video, trimmed_video, final_video]:
+        for f in work_files:
             try:
                 if os.path.exists(f):
                     os.remove(f)
             except:
                 pass
 
-        logger.info("=" * 70)
-        logger.info("✅ SİSTEM TAMAMLANDI")
-        logger.info("=" * 70)
 
-        return True
+def main():
+    logger.info("=" * 70)
+    logger.info("🚀 SADECE RAPIDAPI FRAGMAN SİSTEMİ BAŞLADI")
+    logger.info("=" * 70)
 
-    except Exception as e:
-        logger.error(f"❌ MAIN HATA: {e}", exc_info=True)
+    event_path = os.environ.get("GITHUB_EVENT_PATH")
+
+    if not event_path or not os.path.exists(event_path):
+        logger.error("❌ GITHUB_EVENT_PATH yok. Bu sistem GitHub Actions payload ister.")
         return False
 
+    with open(event_path, encoding="utf-8") as f:
+        event = json.load(f)
+
+    return run_job(event.get("client_payload", {}))
+
 
 if __name__ == "__main__":
     success = main()
@@ -0,0 +1,274 @@
+"""
+mediainfo.py - Saf Python süre okuma (ffprobe süreci açmadan)
+- MP3: baytlar geldikçe frame başlıkları yürünür (ID3v2 atlanır), süre = toplam
+  örnek / örnekleme hızı. Xing/Info veya VBRI başlığındaki frame sayısı ile
+  karşılaştırılır; tutmuyorsa ya da çok fazla çöp bayt varsa sonuç güvenilmez sayılır
+- MP4: moov/mvhd içindeki timescale + duration
+- Güvenilir sonuç yoksa None döner; çağıran ffprobe'a düşer
+"""
+
+import os
+import struct
+
+# (sürüm, katman) → kbps tablosu; index 1..14
+_BITRATES = {
+    (1, 1): [32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],     # MPEG-1
+    2: [22050, 24000, 16000],     # MPEG-2
+    25: [11025, 12000, 8000],     # MPEG-2.5
+}
+
+_VERSIONS = {0b11: 1, 0b10: 2, 0b00: 25}
+_LAYERS = {0b11: 1, 0b10: 2, 0b01: 3}
+
+MAX_JUNK_BYTES = 16 * 1024       # ID3v1 / APE etiketi + birkaç bozuk bayt
+MAX_HEADER_DRIFT = 0.01          # Xing/VBRI frame sayısı ile yürünen sayı farkı
+
+
+def parse_frame_header(header):
+    """
+    4 baytlık MPEG audio başlığı → dict (version, layer, sample_rate, samples,
+    length, mono) veya geçersizse None.
+    """
+    if len(header) < 4:
+        return None
+
+    b1, b2, b3 = header[1], header[2], header[3]
+    if header[0] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = _VERSIONS.get((b1 >> 3) & 0b11)
+    layer = _LAYERS.get((b1 >> 1) & 0b11)
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0b11
+
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    table = (1 if version == 1 else 2, layer)
+    bitrate = _BITRATES[table][bitrate_index - 1] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or version == 1:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+
+    return {
+        "version": version,
+        "layer": layer,
+        "sample_rate": sample_rate,
+        "samples": samples,
+        "length": length,
+        "mono": (b3 >> 6) == 0b11,
+    }
+
+
+def _vbr_header_frames(frame, info):
+    # İlk frame Xing/Info veya VBRI ise içindeki frame sayısı, değilse None
+    if info["layer"] != 3:
+        return None
+
+    if info["version"] == 1:
+        offset = 4 + (17 if info["mono"] else 32)
+    else:
+        offset = 4 + (9 if info["mono"] else 17)
+
+    tag = frame[offset:offset + 4]
+    if tag in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", frame[offset + 4:offset + 8])[0]
+        if flags & 1:
+            return struct.unpack(">I", frame[offset + 8:offset + 12])[0]
+        return 0
+
+    if frame[36:40] == b"VBRI":
+        return struct.unpack(">I", frame[50:54])[0]
+
+    return None
+
+
+def _id3_size(header):
+    # ID3v2 etiketinin toplam boyutu (10 baytlık başlıktan, syncsafe); etiket yoksa 0
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    return 10 + size + (10 if header[5] & 0x10 else 0)
+
+
+class Mp3Duration:
+    """
+    feed(bytes) ile parça parça beslenir (indirme sırasında), result() ile süre alınır.
+    Bellekte en fazla bir frame tutulur.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.skip = 0
+        self.started = False
+        self.first = True
+        self.frames = 0
+        self.samples = 0
+        self.sample_rate = None
+        self.header_frames = None
+        self.junk = 0
+        self.total = 0
+
+    def feed(self, data):
+        self.total += len(data)
+        self.buffer += data
+        consumed = self._consume()
+        # Baştan tek seferde kırp (frame başına del O(n²) olurdu)
+        del self.buffer[:consumed]
+
+    def _consume(self):
+        buf = self.buffer
+        size = len(buf)
+        pos = 0
+
+        while True:
+            if self.skip:
+                dropped = min(self.skip, size - pos)
+                pos += dropped
+                self.skip -= dropped
+                if self.skip:
+                    return pos
+
+            if not self.started:
+                # Dosya başındaki ID3v2 etiketi (syncsafe boyut)
+                if size - pos < 10:
+                    return pos
+                self.started = True
+                self.skip = _id3_size(buf[pos:pos + 10])
+                if self.skip:
+                    continue
+
+            if size - pos < 4:
+                return pos
+
+            info = parse_frame_header(buf[pos:pos + 4])
+            if info is None or (self.sample_rate and info["sample_rate"] != self.sample_rate):
+                # Senkron kaybı / kuyruk etiketi: sonraki 0xFF'e kadar atla
+                next_sync = buf.find(b"\xff", pos + 1)
+                skipped = (next_sync if next_sync > 0 else size) - pos
+                self.junk += skipped
+                pos += skipped
+                continue
+
+            if self.first:
+                # Xing/VBRI kontrolü için ilk frame tam gelmeli
+                if size - pos < info["length"]:
+                    return pos
+                self.first = False
+                self.sample_rate = info["sample_rate"]
+                self.header_frames = _vbr_header_frames(bytes(buf[pos:pos + info["length"]]), info)
+                if self.header_frames is not None:
+                    # Xing/VBRI frame'i sessiz meta veridir, süreye sayılmaz
+                    self.skip = info["length"]
+                    continue
+
+            self.frames += 1
+            self.samples += info["samples"]
+            self.skip = info["length"]
+
+    def result(self):
+        """
+        {"duration", "frames", "header_frames", "junk", "reliable"} döner.
+        reliable=False ise süre ffprobe ile doğrulanmalı.
+        """
+        duration = self.samples / self.sample_rate if self.sample_rate else None
+        # Son frame kısmen gelmiş olabilir (skip bitmeden akış bitti)
+        junk = self.junk + len(self.buffer)
+
+        reliable = bool(duration) and junk <= MAX_JUNK_BYTES
+        if reliable and self.header_frames:
+            drift = abs(self.header_frames - self.frames) / self.header_frames
+            reliable = drift <= MAX_HEADER_DRIFT
+
+        return {
+            "duration": duration,
+            "frames": self.frames,
+            "header_frames": self.header_frames,
+            "junk": junk,
+            "reliable": reliable,
+        }
+
+
+def scan_mp3(path, block_size=256 * 1024):
+    # Diskteki dosya için Mp3Duration.result() (indirme sırasında beslenmediyse)
+    parser = Mp3Duration()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            parser.feed(block)
+    return parser.result()
+
+
+# ============================================
+# MP4 (MVHD)
+# ============================================
+
+def _boxes(f, start, end):
+    # (tip, gövde başı, box sonu) üretir
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        size, kind = struct.unpack(">I4s", f.read(8))
+        header = 8
+
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+
+        if size < header:
+            return
+
+        yield kind, position + header, position + size
+        position += size
+
+
+def mp4_duration(path):
+    # moov/mvhd'den saniye; MP4 değilse veya mvhd yoksa None
+    try:
+        end = os.path.getsize(path)
+        with open(path, "rb") as f:
+            boxes = list(_boxes(f, 0, end))
+            if not boxes or boxes[0][0] != b"ftyp":
+                return None
+
+            for kind, body, box_end in boxes:
+                if kind != b"moov":
+                    continue
+
+                for child, child_body, _ in _boxes(f, body, box_end):
+                    if child != b"mvhd":
+                        continue
+
+                    f.seek(child_body)
+                    version = f.read(1)[0]
+                    if version == 1:
+                        f.seek(child_body + 20)
+                        timescale, duration = struct.unpack(">IQ", f.read(12))
+                    else:
+                        f.seek(child_body + 12)
+                        timescale, duration = struct.unpack(">II", f.read(8))
+
+                    return duration / timescale if timescale else None
+    except (OSError, struct.error, IndexError):
+        return None
+
+    return None
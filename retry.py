@@ -0,0 +1,10 @@
+"""
+retry.py - Tekrar deneme bekleme süresi (uploader / downloader / worker / tts ortak)
+"""
+
+import random
+
+
+def backoff(attempt, base=1.0, cap=60.0):
+    # exponential backoff + jitter
+    return min(cap, base * 2 ** (attempt - 1)) + random.uniform(0, 1)
@@ -0,0 +1,43 @@
+"""
+slots.py - Süreç içi CPU yuvaları
+- worker / batch modunda aynı süreçte birden fazla iş koşar; CPU ağırlıklı ffmpeg
+  adımları FFMPEG_SLOTS ile sınırlanır, ağ adımları (TTS, indirme, upload) beklemez
+- Tek iş çalışırken yuva hep boştur, davranış değişmez
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+FFMPEG_SLOTS = max(1, int(os.environ.get("FFMPEG_SLOTS", "0")) or os.cpu_count() or 1)
+
+_slots = threading.BoundedSemaphore(FFMPEG_SLOTS)
+_lock = threading.Lock()
+_waited = [0.0]
+_in_use = [0]
+
+
+@contextmanager
+def cpu_slot():
+    started = time.monotonic()
+    _slots.acquire()
+    with _lock:
+        _waited[0] += time.monotonic() - started
+        _in_use[0] += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _in_use[0] -= 1
+        _slots.release()
+
+
+def in_use():
+    # Şu an dolu yuva sayısı; encoder thread sayısı çekirdekleri buna göre paylaştırır
+    return _in_use[0]
+
+
+def waited():
+    # Toplam yuva bekleme süresi (sn); büyükse FFMPEG_SLOTS artırılabilir
+    return _waited[0]
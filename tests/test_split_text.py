@@ -0,0 +1,66 @@
+"""
+split_text: fixture metinlerinin beklenen parça sınırları + her limit için
+değişmezler (parça limiti aşmaz, metin kaybolmaz / sıralama bozulmaz)
+"""
+
+import json
+import os
+
+import pytest
+
+from tts import _balance, _pack, _split_long, split_sentences, split_text
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "split_text.json")
+
+with open(FIXTURES, encoding="utf-8") as f:
+    CASES = json.load(f)
+
+
+def _letters(text):
+    # Boşluksuz içerik: sert karakter kesmeleri kelimeyi bölse de karşılaştırılabilir
+    return "".join(text.split())
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case["name"] for case in CASES])
+def test_expected_boundaries(case):
+    assert split_text(case["text"], case["limit"]) == case["expected"]
+
+
+@pytest.mark.parametrize("limit", [20, 40, 60, 80, 120, 500])
+@pytest.mark.parametrize("case", CASES, ids=[case["name"] for case in CASES])
+def test_invariants(case, limit):
+    chunks = split_text(case["text"], limit)
+
+    assert all(chunk and len(chunk) <= limit for chunk in chunks)
+    assert all(chunk == chunk.strip() for chunk in chunks)
+    assert _letters("".join(chunks)) == _letters(case["text"])
+
+
+def test_abbreviations_do_not_end_sentence():
+    sentences = split_sentences("Dr. Ali geldi. Prof. Dr. Veli, örn. dün 2. kez aradı. Bitti!")
+    assert sentences == ["Dr. Ali geldi.", "Prof. Dr. Veli, örn. dün 2. kez aradı.", "Bitti!"]
+
+
+def test_newline_ends_sentence():
+    assert split_sentences("Birinci satır\nİkinci satır.") == ["Birinci satır", "İkinci satır."]
+
+
+def test_pack_is_greedy():
+    assert _pack(["aa", "bb", "cc"], 5) == [["aa", "bb"], ["cc"]]
+    assert _pack(["aa", "bb", "cc"], 8) == [["aa", "bb", "cc"]]
+
+
+def test_split_long_prefers_clauses_then_words_then_chars():
+    assert _split_long("birinci kısım, ikinci kısım", 16) == ["birinci kısım,", "ikinci kısım"]
+    assert _split_long("bir iki üç dört", 8) == ["bir iki", "üç dört"]
+    assert _split_long("abcdefghij", 4) == ["abcd", "efgh", "ij"]
+
+
+def test_balance_evens_out_last_chunk():
+    units = [f"cümle {i}." for i in range(1, 8)]
+    greedy = [len(" ".join(group)) for group in _pack(units, 30)]
+    balanced = [len(" ".join(group)) for group in _balance(units, 30, len(_pack(units, 30)))]
+
+    assert len(balanced) == len(greedy)
+    assert max(balanced) <= 30
+    assert max(balanced) - min(balanced) <= max(greedy) - min(greedy)
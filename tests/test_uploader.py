@@ -0,0 +1,116 @@
+"""
+uploader: gövdenin ortasında bağlantıyı koparan sahte callback'e (fakes.py) karşı
+yükleme. Parçalı modda istemci sunucunun Range ile bildirdiği offset'ten devam
+etmeli; iki modda da sunucuya ulaşan dosya byte byte aynı olmalı.
+"""
+
+import hashlib
+import os
+import random
+import threading
+
+import pytest
+import requests
+
+import fakes
+import uploader
+
+SIZE = 3 * 1024 * 1024 + 12345   # parça sınırına denk gelmesin
+
+
+@pytest.fixture
+def payload(tmp_path):
+    path = tmp_path / "ses.mp3"
+    path.write_bytes(os.urandom(SIZE))
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def no_wait(monkeypatch):
+    monkeypatch.setattr(uploader, "backoff", lambda attempt: 0)
+    random.seed(7)
+
+
+@pytest.fixture
+def callback():
+    server = fakes.start("callback", drop_rate=0.4)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_resumable_resumes_at_server_offset(callback, payload):
+    response = uploader.upload_file(callback.url, payload, "audio", data={"film_id": 1},
+                                    resumable=True, chunk_mb=1, retries=20, log=lambda msg: None)
+
+    assert response.status_code == 200
+    assert callback.state["drops"] > 0
+
+    upload, = callback.state["uploads"]
+    assert upload["bytes"] == SIZE
+    assert upload["sha256"] == digest(payload)
+    assert upload["meta"] == {"film_id": 1}
+
+    # Her veri isteği sunucudaki byte sayısından başlar; kopan parçanın sakladığı yarıdan
+    # sonra gelen istek parça sınırı dışında bir offset'ten devam eder
+    chunks = callback.state["chunks"]
+    assert all(chunk["start"] == chunk["committed"] for chunk in chunks)
+    assert any(chunk["start"] % (1024 * 1024) for chunk in chunks)
+
+
+def test_multipart_retries_whole_body(callback, payload):
+    response = uploader.upload_file(callback.url, payload, "audio", data={"film_id": 1},
+                                    resumable=False, retries=20, log=lambda msg: None)
+
+    assert response.status_code == 200
+    assert callback.state["drops"] > 0
+
+    upload, = callback.state["uploads"]
+    assert upload["mode"] == "multipart"
+    assert upload["sha256"] == digest(payload)
+
+
+class PlainCallbackHandler(fakes.FakeHandler):
+    # Content-Range / X-Upload-* başlıklarını tanımayan, her isteğe 200 dönen callback
+    def do_POST(self):
+        body = self.read_body()
+        with self.server.lock:
+            self.server.state.setdefault("bodies", []).append(body)
+        self.send_bytes(200, b'{"ok": true}', "application/json")
+
+
+@pytest.fixture
+def plain_callback():
+    server = fakes.FakeServer(("127.0.0.1", 0), PlainCallbackHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_resumable_falls_back_when_server_ignores_content_range(plain_callback, payload):
+    response = uploader.upload_file(plain_callback.url, payload, "audio", data={"film_id": 1},
+                                    resumable=True, chunk_mb=1, retries=3, log=lambda msg: None)
+
+    assert uploader.upload_ok(response)
+
+    # Boş sorgu "tamamlandı" sayılmaz; son istek dosyanın tamamını taşıyan multipart
+    last = plain_callback.state["bodies"][-1]
+    with open(payload, "rb") as f:
+        content = f.read()
+    assert b'name="audio"; filename="ses.mp3"' in last
+    assert content in last
+    assert len(last) > SIZE
+
+
+@pytest.mark.parametrize("status, expected", [(200, True), (201, True), (204, True),
+                                              (302, False), (308, False), (400, False), (500, False)])
+def test_upload_ok(status, expected):
+    response = requests.Response()
+    response.status_code = status
+    assert uploader.upload_ok(response) is expected
@@ -0,0 +1,248 @@
+"""
+tracing.py - İş başına aşama ölçümü (tts.py / fragman.py ortak)
+- span(ad): duvar süresi, taşınan byte, alt süreç (ffmpeg) CPU süresi ve en yüksek RSS
+- Alt süreç CPU / RSS tam ölçülür: run() / communicate() çocuğu os.wait4 ile toplar,
+  değerler span'e ve üst span'lerine eklenir (child_rss_peak_mb)
+- process_rss_peak_mb aşamaya ait değildir: Python sürecinin span bittiği ana kadarki
+  tepe RSS'i (RUSAGE_SELF); worker'da önceki işleri de kapsar
+- Aktif tracer contextvars ile taşınır; worker / batch'te eşzamanlı işler karışmaz.
+  Thread havuzuna iş verirken context kopyalanmalı (StageGraph bunu yapar)
+- İş sonunda TRACE_DIR/<iş>_<id>.json; TRACE_CHROME=1 ise chrome://tracing /
+  Perfetto için <iş>_<id>.chrome.json
+"""
+
+import contextvars
+import json
+import os
+import resource
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_DIR    = os.environ.get("TRACE_DIR", "traces")
+TRACE_CHROME = os.environ.get("TRACE_CHROME", "") == "1"
+
+_tracer = contextvars.ContextVar("tracer", default=None)
+_span = contextvars.ContextVar("span", default=None)
+
+
+def _self_rss_mb():
+    # Sürecin başından beri tepe RSS (high-water mark, düşmez); Linux'ta ru_maxrss KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Span:
+
+    def __init__(self, name, parent, meta):
+        self.name = name
+        self.parent = parent
+        self.meta = meta
+        self.thread = threading.current_thread().name
+        self.start = time.monotonic()
+        self.end = None
+        self.bytes = 0
+        self.cpu_user = 0.0
+        self.cpu_sys = 0.0
+        self.child_rss_mb = 0.0
+        self.process_rss_mb = 0.0
+
+    def add_bytes(self, nbytes):
+        self.bytes += nbytes
+
+    def add_child(self, usage):
+        # Çocuk sürecin CPU'su bu span'e ve tüm üstlerine yazılır
+        node = self
+        while node is not None:
+            node.cpu_user += usage.ru_utime
+            node.cpu_sys += usage.ru_stime
+            node.child_rss_mb = max(node.child_rss_mb, usage.ru_maxrss / 1024)
+            node = node.parent
+
+    def to_dict(self, t0):
+        return {
+            "name": self.name,
+            "parent": self.parent.name if self.parent else None,
+            "thread": self.thread,
+            "start": round(self.start - t0, 3),
+            "wall": round(self.end - self.start, 3),
+            "bytes": self.bytes,
+            "child_cpu_user": round(self.cpu_user, 3),
+            "child_cpu_sys": round(self.cpu_sys, 3),
+            "child_rss_peak_mb": round(self.child_rss_mb, 1),
+            "process_rss_peak_mb": round(self.process_rss_mb, 1),
+            **({"meta": self.meta} if self.meta else {}),
+        }
+
+
+class _NullSpan:
+    # Aktif tracer yokken span() bunu verir; çağıranlar kontrol etmek zorunda kalmaz
+    meta = {}
+
+    def add_bytes(self, nbytes):
+        pass
+
+    def add_child(self, usage):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+
+    def __init__(self, job, job_id=None, **meta):
+        self.job = job
+        self.job_id = job_id
+        self.meta = meta
+        self.spans = []
+        self.lock = threading.Lock()
+        self.t0 = time.monotonic()
+        self.started_at = time.time()
+
+    @contextmanager
+    def activate(self):
+        token = _tracer.set(self)
+        try:
+            yield self
+        finally:
+            _tracer.reset(token)
+
+    def record(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+    def summary(self):
+        # Aynı adlı span'ler toplanır: {ad: {count, wall, bytes, child_cpu}}
+        totals = {}
+        for s in self.spans:
+            t = totals.setdefault(s.name, {"count": 0, "wall": 0.0, "bytes": 0, "child_cpu": 0.0})
+            t["count"] += 1
+            t["wall"] = round(t["wall"] + s.end - s.start, 3)
+            t["bytes"] += s.bytes
+            t["child_cpu"] = round(t["child_cpu"] + s.cpu_user + s.cpu_sys, 3)
+        return totals
+
+    def to_dict(self):
+        spans = sorted(self.spans, key=lambda s: s.start)
+        return {
+            "job": self.job,
+            "id": self.job_id,
+            "meta": self.meta,
+            "started_at": self.started_at,
+            "wall": round(time.monotonic() - self.t0, 3),
+            "process_rss_peak_mb": round(_self_rss_mb(), 1),
+            "summary": self.summary(),
+            "spans": [s.to_dict(self.t0) for s in spans],
+        }
+
+    def chrome_events(self):
+        # "X" (complete) olayları; thread adları tid numarasına eşlenir
+        tids = {}
+        events = []
+
+        for s in sorted(self.spans, key=lambda s: s.start):
+            lane = s.meta.get("lane", s.thread)
+            tid = tids.setdefault(lane, len(tids) + 1)
+            events.append({
+                "name": s.name, "cat": self.job, "ph": "X", "pid": 1, "tid": tid,
+                "ts": round((s.start - self.t0) * 1e6), "dur": round((s.end - s.start) * 1e6),
+                "args": {k: v for k, v in s.to_dict(self.t0).items() if k not in ("name", "start", "wall")},
+            })
+
+        for lane, tid in tids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": lane}})
+        events.append({"name": "process_name", "ph": "M", "pid": 1, "args": {"name": f"{self.job} {self.job_id}"}})
+        return events
+
+    def write(self, directory=TRACE_DIR, chrome=TRACE_CHROME):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{self.job}_{self.job_id}" if self.job_id is not None else self.job)
+
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+        if chrome:
+            with open(f"{base}.chrome.json", "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": self.chrome_events()}, f)
+
+        return f"{base}.json"
+
+
+@contextmanager
+def span(name, **meta):
+    tracer = _tracer.get()
+    if tracer is None:
+        yield NULL_SPAN
+        return
+
+    current = Span(name, _span.get(), meta)
+    token = _span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.meta["error"] = f"{type(e).__name__}: {str(e)[:200]}"
+        raise
+    finally:
+        current.end = time.monotonic()
+        current.process_rss_mb = _self_rss_mb()
+        _span.reset(token)
+        tracer.record(current)
+
+
+def current_span():
+    return _span.get() or NULL_SPAN
+
+
+# ============================================
+# ALT SÜREÇ (CPU / RSS ÖLÇÜMLÜ)
+# ============================================
+
+def communicate(proc, input=None):
+    """
+    Popen.communicate() yerine: pipe'ları thread'lerle okur, çocuğu os.wait4 ile
+    toplar ve rusage'ı aktif span'e yazar. (stdout, stderr) döner.
+    """
+    results = {}
+
+    def drain(name, stream):
+        results[name] = stream.read()
+        stream.close()
+
+    readers = [
+        threading.Thread(target=drain, args=(name, stream), daemon=True)
+        for name, stream in (("stdout", proc.stdout), ("stderr", proc.stderr))
+        if stream is not None
+    ]
+    for reader in readers:
+        reader.start()
+
+    if proc.stdin is not None:
+        try:
+            if input is not None:
+                proc.stdin.write(input)
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    current_span().add_child(usage)
+
+    for reader in readers:
+        reader.join()
+
+    return results.get("stdout"), results.get("stderr")
+
+
+def run(cmd, input=None, capture_output=False, **kwargs):
+    # subprocess.run benzeri (check yok), CompletedProcess döner
+    if capture_output:
+        kwargs.setdefault("stdout", subprocess.PIPE)
+        kwargs.setdefault("stderr", subprocess.PIPE)
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+
+    proc = subprocess.Popen(cmd, **kwargs)
+    stdout, stderr = communicate(proc, input)
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
@@ -1,135 +1,766 @@
+import asyncio
+import contextvars
+import hashlib
 import json
 import os
+import re
 import subprocess
-import requests
-import tempfile
+import sys
+import threading
+import time
+import unicodedata
+import aiohttp
+import edge_tts
+
+from cache import DiskCache, make_key
+from checkpoint import Checkpoint
+from retry import backoff
+from slots import cpu_slot
+from tracing import Tracer, span
+import tracing
+from uploader import upload_file, upload_ok
 
 # ---------------------------
-# GITHUB EVENT
+# AYARLAR
 # ---------------------------
-event_path = os.environ.get("GITHUB_EVENT_PATH")
-
-with open(event_path, "r", encoding="utf-8") as f:
-    event = json.load(f)
-
-payload  = event["client_payload"]
-film_id  = payload["film_id"]
-text     = payload["text"]
-callback = payload["callback"]
-
-print("🎬 Film ID:", film_id)
+VOICE           = "tr-TR-EmelNeural"
+TTS_CONCURRENCY = max(1, int(os.environ.get("TTS_CONCURRENCY", "4")))
+TTS_RETRIES     = max(1, int(os.environ.get("TTS_RETRIES", "3")))
+TTS_ENDPOINT    = os.environ.get("TTS_ENDPOINT", "").strip()
+TTS_RATE        = os.environ.get("TTS_RATE", "+0%")
+TTS_PITCH       = os.environ.get("TTS_PITCH", "+0Hz")
+TTS_CACHE_DIR   = os.environ.get("TTS_CACHE_DIR", os.path.join(".cache", "tts"))
+TTS_CACHE_MB    = int(os.environ.get("TTS_CACHE_MB", "500"))
+TTS_GAP_MS      = max(0, int(os.environ.get("TTS_GAP_MS", "0")))
+TTS_LOUDNORM    = os.environ.get("TTS_LOUDNORM", "two-pass")  # two-pass | dynamic
+TTS_PIPELINE    = os.environ.get("TTS_PIPELINE", "progressive")  # progressive | batch
 
 # ---------------------------
 # METNİ PARÇALA (EDGE TTS LIMIT)
 # ---------------------------
-def split_text(text, limit=500):
-    parts = []
-    current = ""
+# Nokta ile bitse de cümle sonu sayılmayan kısaltmalar (küçük harf, noktasız)
+ABBREVIATIONS = {
+    "dr", "prof", "doç", "doc", "yrd", "uzm", "op", "av", "müh", "öğr", "gör",
+    "sn", "bkz", "örn", "vb", "vs", "vd", "yy", "no", "nu", "s", "sf", "st",
+    "mr", "mrs", "ms", "jr", "sr", "vol", "bl", "ed", "çev", "haz", "yön",
+}
 
-    for sentence in text.split("."):
-        sentence = sentence.strip()
-        if not sentence:
-            continue
+_TERMINATORS = ".!?…"
+_OPENERS     = "\"'“‘«(["
+_CLOSERS     = "\"'”’»)]"
+_TOKEN_RE    = re.compile(r"\S+")
+_CLAUSE_RE   = re.compile(r"(?<=[,;:])\s+|\s+(?=[—–-]\s)")
 
-        if len(current) + len(sentence) < limit:
-            current += sentence + ". "
-        else:
-            parts.append(current.strip())
-            current = sentence + ". "
+
+def _is_sentence_end(token, next_token):
+    core = token.rstrip(_CLOSERS)
+    if not core or core[-1] not in _TERMINATORS:
+        return False
+
+    if next_token is None or core[-1] != ".":
+        return True
+
+    # "Dr.", "örn.", "J. R. R." → cümle bitmedi
+    word = core.rstrip(".").lstrip(_OPENERS).lower()
+    if word in ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+        return False
+
+    # Türkçe cümle büyük harfle başlar: "2. dünya savaşı", "vb. şeyler"
+    first = next_token.lstrip(_OPENERS)[:1]
+    return not first.islower()
+
+
+def split_sentences(text):
+    # Tek geçiş: kelime kelime ilerle, . ! ? … ve satır sonlarında böl
+    sentences = []
+    current = []
+    tokens = list(_TOKEN_RE.finditer(text))
+    prev_end = 0
+
+    for idx, match in enumerate(tokens):
+        if current and "\n" in text[prev_end:match.start()]:
+            sentences.append(" ".join(current))
+            current = []
+
+        token = match.group()
+        current.append(token)
+        prev_end = match.end()
+
+        next_token = tokens[idx + 1].group() if idx + 1 < len(tokens) else None
+        if _is_sentence_end(token, next_token):
+            sentences.append(" ".join(current))
+            current = []
 
     if current:
-        parts.append(current.strip())
+        sentences.append(" ".join(current))
 
-    return parts
+    return sentences
 
-parts = split_text(text)
-print(f"🔊 Parça sayısı: {len(parts)}")
 
-# ---------------------------
-# GEÇİCİ KLASÖR
-# ---------------------------
-tmp_dir = tempfile.mkdtemp()
-audio_files = []
+def _pack(units, cap):
+    # Sırayı bozmadan birimleri cap'i aşmayacak şekilde grupla (greedy)
+    groups = []
+    size = -1
+
+    for unit in units:
+        if groups and size + 1 + len(unit) <= cap:
+            groups[-1].append(unit)
+            size += 1 + len(unit)
+        else:
+            groups.append([unit])
+            size = len(unit)
+
+    return groups
+
+
+def _split_long(sentence, limit):
+    # Limit aşan cümle: önce yan cümle (, ; : —), sonra kelime, en son harf sınırı
+    if len(sentence) <= limit:
+        return [sentence]
+
+    units = []
+    for clause in _CLAUSE_RE.split(sentence):
+        if len(clause) <= limit:
+            units.append(clause)
+            continue
+
+        for word in clause.split():
+            units.extend(word[i:i + limit] for i in range(0, len(word), limit))
+
+    return [" ".join(group) for group in _pack(units, limit)]
+
+
+def _balance(units, limit, count):
+    # count parçaya böl; her parça kalan metnin ortalamasına en yakın boyutta
+    left = sum(len(u) + 1 for u in units)
+    groups = []
+    size = 0
+
+    for unit in units:
+        n = len(unit) + 1
+        if groups:
+            ideal = left / max(1, count - len(groups) + 1)
+            if size + n <= limit + 1 and abs(size + n - ideal) <= abs(size - ideal):
+                groups[-1].append(unit)
+                size += n
+                continue
+            left -= size
+
+        groups.append([unit])
+        size = n
+
+    return groups
+
+
+def split_text(text, limit=500):
+    units = []
+    for sentence in split_sentences(text):
+        units.extend(_split_long(sentence, limit))
+
+    if not units:
+        return []
+
+    # Parça sayısı greedy ile en az; sonra uzunluklar eşitlenir ki
+    # paralel sentezde işler eşit dağılsın. Hiçbir parça limiti aşmaz.
+    groups = _pack(units, limit)
+    balanced = _balance(units, limit, len(groups))
+    if len(balanced) <= len(groups):
+        groups = balanced
+
+    return [" ".join(group) for group in groups]
+
+def normalize_text(part):
+    # Cache anahtarı ve sentez aynı metni görsün: NFC + tek boşluk
+    return " ".join(unicodedata.normalize("NFC", part).split())
+
 
 # ---------------------------
-# PARÇA PARÇA SES ÜRET
+# TTS MOTORU (ASYNC, TEK SÜREÇ)
 # ---------------------------
-for i, part in enumerate(parts):
-    out_file = os.path.join(tmp_dir, f"part_{i}.mp3")
+# TTS_ENDPOINT boşsa Edge TTS kullanılır; doluysa aynı payload'ı kabul eden
+# HTTP servise gider (örn. yerel test için: python fakes.py tts)
+async def _edge_stream(session, part):
+    communicate = edge_tts.Communicate(part, VOICE, rate=TTS_RATE, pitch=TTS_PITCH)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            yield chunk["data"]
 
-    cmd = [
-        "edge-tts",
-        "--voice", "tr-TR-EmelNeural",
-        "--text", part,
-        "--write-media", out_file
-    ]
 
-    subprocess.run(cmd, check=True)
-    audio_files.append(out_file)
+async def _http_stream(session, part):
+    body = {"text": part, "voice": VOICE, "rate": TTS_RATE, "pitch": TTS_PITCH}
+    async with session.post(TTS_ENDPOINT, json=body) as resp:
+        resp.raise_for_status()
+        async for data in resp.content.iter_chunked(64 * 1024):
+            yield data
+
+
+async def synthesize_part(session, i, part, retries=TTS_RETRIES):
+    stream = _http_stream if TTS_ENDPOINT else _edge_stream
+
+    for attempt in range(1, retries + 1):
+        try:
+            audio = bytearray()
+            async for data in stream(session, part):
+                audio += data
+
+            if not audio:
+                raise RuntimeError("TTS boş ses döndürdü")
+
+            print(f"✅ Parça {i+1} üretildi ({len(audio)/1024:.0f} KB)")
+            return bytes(audio)
+
+        except Exception as e:
+            if attempt == retries:
+                raise
+
+            wait = backoff(attempt)
+            print(f"⚠️ Parça {i+1} hata (deneme {attempt}/{retries}): {str(e)[:120]} | {wait:.1f} sn sonra tekrar")
+            await asyncio.sleep(wait)
 
-    print(f"✅ Parça {i+1} üretildi")
 
 # ---------------------------
-# MP3 CONCAT LIST (FFMPEG)
+# PARÇA CACHE (METİN + SES AYARI HASH)
 # ---------------------------
-concat_file = os.path.join(tmp_dir, "concat.txt")
+tts_cache = DiskCache(os.path.join(TTS_CACHE_DIR, "chunks"), TTS_CACHE_MB * 1024 * 1024, suffix=".mp3")
+
+
+def chunk_key(part):
+    return make_key(part, VOICE, TTS_RATE, TTS_PITCH)
+
 
-with open(concat_file, "w", encoding="utf-8") as f:
-    for af in audio_files:
-        f.write(f"file '{af}'\n")
+async def synthesize_parts(parts, concurrency=TTS_CONCURRENCY, cache=tts_cache, on_chunk=None):
+    # Parçalar paralel üretilir, ses byte'ları orijinal sırayla döner.
+    # Cache'te olan parçalar hiç sentezlenmez. on_chunk(i, audio) her parça hazır
+    # olduğunda (sırasız) çağrılır; bloklamamalı.
+    semaphore = asyncio.Semaphore(concurrency)
 
-raw_audio = f"raw_{film_id}.mp3"
-final_audio = f"ses_{film_id}.mp3"
+    async with aiohttp.ClientSession() as session:
 
-print("🔗 Parçalar birleştiriliyor...")
+        async def run(i, part):
+            key = chunk_key(part)
+            audio = cache.get(key)
+            if audio is not None:
+                print(f"♻️ Parça {i+1} cache'ten")
+                if on_chunk:
+                    on_chunk(i, audio)
+                return audio
 
-subprocess.run([
-    "ffmpeg", "-y",
-    "-f", "concat",
-    "-safe", "0",
-    "-i", concat_file,
-    "-c", "copy",
-    raw_audio
-], check=True)
+            async with semaphore:
+                # Her task kendi context'inde; chrome trace'te ayrı satır
+                with span("chunk", lane=f"chunk {i+1}") as s:
+                    audio = await synthesize_part(session, i, part)
+                    s.add_bytes(len(audio))
+
+            cache.put(key, audio, evict=False)
+            if on_chunk:
+                on_chunk(i, audio)
+            return audio
+
+        tasks = [asyncio.create_task(run(i, part)) for i, part in enumerate(parts)]
+
+        try:
+            chunks = [await task for task in tasks]
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    cache.evict()
+    return chunks
 
-print("✅ Ham ses birleştirildi:", raw_audio)
 
 # ---------------------------
-# MASTERING (DUYGULU SES EFEKTİ)
+# CONCAT + MASTERING (TEK FFMPEG GEÇİŞİ)
 # ---------------------------
-print("🎚️ Mastering uygulanıyor (EQ + Compressor + Reverb + Normalize)...")
-
-ffmpeg_filter = (
+MASTER_FILTER = (
     "equalizer=f=120:t=q:w=1:g=4,"     # bass boost
     "equalizer=f=3000:t=q:w=1:g=2,"    # clarity boost
     "acompressor=threshold=-18dB:ratio=3:attack=20:release=250,"
     "alimiter=limit=0.9,"
-    "aecho=0.8:0.88:60:0.25,"          # reverb/echo vibe
-    "loudnorm=I=-14:TP=-1.5:LRA=11"    # youtube standard
+    "aecho=0.8:0.88:60:0.25"           # reverb/echo vibe
 )
 
-subprocess.run([
-    "ffmpeg", "-y",
-    "-i", raw_audio,
-    "-af", ffmpeg_filter,
-    "-b:a", "192k",
-    final_audio
-], check=True)
+LOUDNORM = "loudnorm=I=-14:TP=-1.5:LRA=11"  # youtube standard
+
+SAMPLE_RATE = 24000  # Edge TTS çıkışı: 24 kHz mono
+
+
+def _feed_pipe(fd, data):
+    try:
+        with os.fdopen(fd, "wb") as pipe:
+            pipe.write(data)
+    except BrokenPipeError:
+        pass
+
+
+def concat_filter(count, tail, gap_ms=TTS_GAP_MS):
+    # Her parça ayrı decode edilir, filtre grafiğinde birleştirilir (MP3 frame
+    # sınırlarında kesinti olmaz). İstenirse parçalar arasına sessizlik eklenir.
+    graph = []
+    labels = []
+
+    for i in range(count):
+        graph.append(f"[{i}:a]aformat=sample_rates={SAMPLE_RATE}:channel_layouts=mono[c{i}]")
+        labels.append(f"[c{i}]")
+
+        if gap_ms > 0 and i < count - 1:
+            graph.append(f"anullsrc=r={SAMPLE_RATE}:cl=mono,atrim=duration={gap_ms / 1000:.3f}[g{i}]")
+            labels.append(f"[g{i}]")
+
+    graph.append(f"{''.join(labels)}concat=n={len(labels)}:v=0:a=1,{MASTER_FILTER},{tail}[out]")
+    return ";".join(graph)
+
+
+def run_graph(chunks, tail, output_args, gap_ms=TTS_GAP_MS):
+    # Aynı süreçte birden fazla iş varsa (worker / batch) ffmpeg CPU yuvası bekler
+    with cpu_slot():
+        return _run_graph(chunks, tail, output_args, gap_ms)
+
+
+def _run_graph(chunks, tail, output_args, gap_ms):
+    # Parçalar diske yazılmaz: her biri ayrı bir pipe ile ffmpeg'e girer.
+    # ffmpeg stderr'i döner (loudnorm JSON raporu burada).
+    pipes = [os.pipe() for _ in chunks]
+
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-nostats"]
+    for read_fd, _ in pipes:
+        cmd += ["-f", "mp3", "-i", f"pipe:{read_fd}"]
+
+    cmd += ["-filter_complex", concat_filter(len(chunks), tail, gap_ms), "-map", "[out]"]
+    cmd += output_args
+
+    proc = subprocess.Popen(
+        cmd,
+        pass_fds=[read_fd for read_fd, _ in pipes],
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace"
+    )
+
+    for read_fd, _ in pipes:
+        os.close(read_fd)
+
+    # ffmpeg girişleri sırayla probe eder; her pipe ayrı thread ile beslenmeli
+    writers = [
+        threading.Thread(target=_feed_pipe, args=(write_fd, data), daemon=True)
+        for (_, write_fd), data in zip(pipes, chunks)
+    ]
+    for writer in writers:
+        writer.start()
+
+    _, stderr = tracing.communicate(proc)
+    for writer in writers:
+        writer.join()
+
+    if proc.returncode != 0:
+        print(stderr[-1500:])
+        raise subprocess.CalledProcessError(proc.returncode, cmd[0], stderr=stderr)
+
+    return stderr
 
-print("🎧 Final mastering ses oluşturuldu:", final_audio)
 
 # ---------------------------
-# SUNUCUYA GERİ GÖNDER
+# LOUDNESS (İKİ GEÇİŞLİ LOUDNORM)
 # ---------------------------
-print("📤 Sunucuya gönderiliyor...")
+loudness_cache = DiskCache(os.path.join(TTS_CACHE_DIR, "loudnorm"), 16 * 1024 * 1024, suffix=".json")
+
+
+def parse_loudnorm(stderr):
+    # loudnorm print_format=json çıktısı stderr'in sonundaki {...} bloğu
+    blocks = re.findall(r"\{[^{}]*\}", stderr)
+    if not blocks:
+        raise RuntimeError("loudnorm ölçümü okunamadı")
+    return json.loads(blocks[-1])
+
 
-with open(final_audio, "rb") as audio:
-    response = requests.post(
-        callback,
-        files={"audio": audio},
-        data={"film_id": film_id},
-        timeout=120
+def loudness_key(digests, gap_ms=TTS_GAP_MS):
+    # Aynı giriş (parça hash'leri + filtre + boşluk) için ölçüm tekrar yapılmaz
+    return make_key(digests, MASTER_FILTER, LOUDNORM, gap_ms)
+
+
+def measure_loudness(chunks, gap_ms=TTS_GAP_MS):
+    key = loudness_key([hashlib.sha256(c).hexdigest() for c in chunks], gap_ms)
+    cached = loudness_cache.get(key)
+    if cached is not None:
+        print("♻️ Loudness ölçümü cache'ten")
+        return json.loads(cached), True
+
+    print("📏 Loudness ölçülüyor (1. geçiş)...")
+    with span("measure"):
+        stderr = run_graph(chunks, f"{LOUDNORM}:print_format=json", ["-f", "null", "-"], gap_ms)
+    measured = parse_loudnorm(stderr)
+
+    loudness_cache.put(key, json.dumps(measured).encode("utf-8"))
+    return measured, False
+
+
+def master_audio(chunks, output, gap_ms=TTS_GAP_MS, mode=TTS_LOUDNORM):
+    encode = ["-b:a", "192k", output]
+
+    if mode != "two-pass":
+        with span("master", mode=mode):
+            stderr = run_graph(chunks, f"{LOUDNORM}:print_format=json", encode, gap_ms)
+        achieved = parse_loudnorm(stderr)
+        return {"mode": "dynamic", "measured": achieved, "cached_measurement": False, "achieved": achieved}
+
+    measured, cached = measure_loudness(chunks, gap_ms)
+
+    print("🎚️ Lineer normalize (2. geçiş)...")
+    with span("master", mode=mode):
+        achieved = parse_loudnorm(run_graph(chunks, linear_loudnorm(measured), encode, gap_ms))
+    return {"mode": "two-pass", "measured": measured, "cached_measurement": cached, "achieved": achieved}
+
+
+def linear_loudnorm(measured):
+    # 1. geçiş ölçümüyle lineer (tek kazanç) normalize filtresi
+    return (
+        f"{LOUDNORM}"
+        f":measured_I={measured['input_i']}"
+        f":measured_TP={measured['input_tp']}"
+        f":measured_LRA={measured['input_lra']}"
+        f":measured_thresh={measured['input_thresh']}"
+        f":offset={measured['target_offset']}"
+        ":linear=true:print_format=json"
     )
 
-print("📡 Callback HTTP:", response.status_code)
-print("✅ İşlem tamamlandı.")
+
+# ---------------------------
+# PROGRESİF MASTERING (SENTEZLE PARALEL)
+# ---------------------------
+class ProgressiveError(Exception):
+    # Parça tek akışa çevrilemedi (decode hatası vb.); batch mastering'e düşülür
+    pass
+
+
+def decode_pcm(audio):
+    """
+    Tek parça MP3 → ham PCM (f32le, mono, SAMPLE_RATE). Her parça ayrı decode edilir:
+    ffmpeg LAME etiketindeki encoder delay / padding'i kırpar, birleşim yerlerinde
+    batch'teki (parça başına giriş) gibi boşluk / tıklama kalmaz.
+    """
+    result = tracing.run([
+        "ffmpeg", "-v", "error", "-f", "mp3", "-i", "pipe:0",
+        "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"
+    ], input=audio, capture_output=True)
+
+    if result.returncode != 0 or not result.stdout:
+        raise ProgressiveError(result.stderr.decode("utf-8", "replace")[-300:] or "boş decode")
+    return result.stdout
+
+
+class ProgressiveMaster:
+    """
+    Sentez sürerken mastering: tek, uzun ömürlü ffmpeg; parçalar hazır oldukça
+    ayrı ayrı PCM'e decode edilip (decode_pcm, gapless) sırayla pipe'a yazılır,
+    aralara örnek hassasiyetinde sessizlik.
+    - dynamic : ffmpeg final MP3'ü doğrudan yazar, son parçadan hemen sonra biter
+    - two-pass: ffmpeg mastering çıktısını kayıpsız WAV'a yazarken asplit ile
+      loudnorm ölçümünü de yapar; sonra sadece WAV → lineer normalize + encode.
+      Ölçüm loudness_cache'e (parça hash'leri) yazılır; cache'te varsa o kullanılır
+    Bu ffmpeg ömrünün çoğunda sentezi bekler; CPU yuvası sadece 2. geçişte alınır.
+    """
+
+    def __init__(self, count, output, gap_ms=TTS_GAP_MS, mode=TTS_LOUDNORM):
+        self.count = count
+        self.output = output
+        self.gap_ms = gap_ms
+        self.mode = mode
+        self.pending = {}
+        self.cond = threading.Condition()
+        self.aborted = False
+        self.error = None
+        self.stderr = ""
+        self.digests = []
+        self.intermediate = f"{output}.master.wav" if mode == "two-pass" else None
+
+        read_fd, self.write_fd = os.pipe()
+        chain = f"[0:a]aformat=sample_rates={SAMPLE_RATE}:channel_layouts=mono,{MASTER_FILTER}"
+
+        cmd = ["ffmpeg", "-y", "-hide_banner", "-nostats",
+               "-f", "f32le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", f"pipe:{read_fd}"]
+        if self.intermediate:
+            cmd += ["-filter_complex", f"{chain},asplit[out][m];[m]{LOUDNORM}:print_format=json,anullsink",
+                    "-map", "[out]", "-c:a", "pcm_f32le", self.intermediate]
+        else:
+            cmd += ["-filter_complex", f"{chain},{LOUDNORM}:print_format=json[out]",
+                    "-map", "[out]", "-b:a", "192k", output]
+
+        self.cmd = cmd
+        self.proc = subprocess.Popen(
+            cmd,
+            pass_fds=[read_fd],
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace"
+        )
+        os.close(read_fd)
+
+        # Parça decode'ları ve ffmpeg CPU'su aktif tracer'a (ayrı satırlar) yazılsın
+        self.writer = threading.Thread(target=contextvars.copy_context().run, args=(self._write,), daemon=True)
+        self.reader = threading.Thread(target=contextvars.copy_context().run, args=(self._wait,), daemon=True)
+        self.writer.start()
+        self.reader.start()
+
+    def submit(self, i, audio):
+        with self.cond:
+            self.pending[i] = audio
+            self.cond.notify_all()
+
+    def _next(self, i):
+        with self.cond:
+            self.cond.wait_for(lambda: i in self.pending or self.aborted)
+            return None if self.aborted else self.pending.pop(i)
+
+    def _write(self):
+        try:
+            with os.fdopen(self.write_fd, "wb") as pipe:
+                for i in range(self.count):
+                    audio = self._next(i)
+                    if audio is None:
+                        return
+
+                    try:
+                        with span("decode", lane="decode") as s:
+                            pcm = decode_pcm(audio)
+                            s.add_bytes(len(audio))
+                    except ProgressiveError as e:
+                        raise ProgressiveError(f"Parça {i+1} decode edilemedi: {e}")
+                    self.digests.append(hashlib.sha256(audio).hexdigest())
+
+                    if i and self.gap_ms > 0:
+                        # f32le mono: örnek başına 4 bayt sıfır
+                        pipe.write(bytes(4 * round(SAMPLE_RATE * self.gap_ms / 1000)))
+                    pipe.write(pcm)
+
+        except BrokenPipeError:
+            pass  # ffmpeg erken çıktı; finish() stderr'i raporlar
+
+        except Exception as e:
+            # Yarım akış geçerli bir çıktı gibi bitmesin
+            self.error = e
+            self.proc.kill()
+
+    def _wait(self):
+        with span("master", mode=self.mode, pipeline="progressive"):
+            _, self.stderr = tracing.communicate(self.proc)
+
+    def abort(self):
+        with self.cond:
+            self.aborted = True
+            self.cond.notify_all()
+        self.proc.kill()
+        self.writer.join()
+        self.reader.join()
+        self._cleanup()
+
+    def _cleanup(self):
+        if self.intermediate and os.path.exists(self.intermediate):
+            os.remove(self.intermediate)
+
+    def finish(self):
+        # Tüm parçalar submit edildikten sonra: akış bitene kadar bekler, master_audio ile aynı sonucu döner
+        self.writer.join()
+        self.reader.join()
+
+        try:
+            if self.error:
+                raise self.error
+
+            if self.proc.returncode != 0:
+                print(self.stderr[-1500:])
+                raise subprocess.CalledProcessError(self.proc.returncode, self.cmd[0], stderr=self.stderr)
+
+            if not self.intermediate:
+                achieved = parse_loudnorm(self.stderr)
+                return {"mode": "dynamic", "measured": achieved, "cached_measurement": False, "achieved": achieved}
+
+            # Aynı parçalar daha önce ölçüldüyse (batch ya da progresif) aynı ölçüm:
+            # yeniden denemeler aynı kazancı uygular
+            key = loudness_key(self.digests, self.gap_ms)
+            cached = loudness_cache.get(key)
+            if cached is not None:
+                print("♻️ Loudness ölçümü cache'ten")
+                measured = json.loads(cached)
+            else:
+                measured = parse_loudnorm(self.stderr)
+                loudness_cache.put(key, json.dumps(measured).encode("utf-8"))
+
+            print("🎚️ Lineer normalize (2. geçiş, mastering WAV'ından)...")
+            cmd = ["ffmpeg", "-y", "-hide_banner", "-nostats", "-i", self.intermediate,
+                   "-af", linear_loudnorm(measured), "-b:a", "192k", self.output]
+
+            with cpu_slot(), span("normalize", mode=self.mode):
+                result = tracing.run(cmd, capture_output=True, text=True, errors="replace")
+
+            if result.returncode != 0:
+                print(result.stderr[-1500:])
+                raise subprocess.CalledProcessError(result.returncode, cmd[0], stderr=result.stderr)
+
+            achieved = parse_loudnorm(result.stderr)
+            return {"mode": "two-pass", "measured": measured, "cached_measurement": cached is not None,
+                    "achieved": achieved}
+
+        finally:
+            self._cleanup()
+
+
+def loudness_report(result):
+    achieved = result["achieved"]
+    measured = result["measured"]
+    return {
+        "mode": result["mode"],
+        "target": {"I": -14.0, "TP": -1.5, "LRA": 11.0},
+        "measured": {
+            "I": float(measured["input_i"]),
+            "TP": float(measured["input_tp"]),
+            "LRA": float(measured["input_lra"]),
+        },
+        "achieved": {
+            "I": float(achieved["output_i"]),
+            "TP": float(achieved["output_tp"]),
+            "LRA": float(achieved["output_lra"]),
+        },
+        "normalization_type": achieved.get("normalization_type"),
+        "cached_measurement": result["cached_measurement"],
+    }
+
+
+
+# ---------------------------
+# İŞ (GITHUB EVENT / WORKER)
+# ---------------------------
+def run_job(payload, keep_files=True):
+    """
+    Tek metni seslendirir, mastering yapar ve callback'e yükler.
+    payload = repository_dispatch client_payload (film_id, text, callback).
+    Callback 2xx dönerse True (upload_ok). Aşama ölçümleri TRACE_DIR/tts_<film_id>.json
+    """
+    film_id = payload["film_id"]
+    final_audio = f"ses_{film_id}.mp3"
+    loudness_file = f"ses_{film_id}.loudness.json"
+    tracer = Tracer("tts", film_id, voice=VOICE, loudnorm=TTS_LOUDNORM, pipeline=TTS_PIPELINE,
+                    endpoint=TTS_ENDPOINT or "edge")
+
+    # Callback düşerse yeniden denemede mastering tekrarlanmaz (parçalar zaten tts_cache'te)
+    checkpoint = Checkpoint("tts", film_id, {
+        "text": payload["text"], "voice": VOICE, "rate": TTS_RATE, "pitch": TTS_PITCH,
+        "gap_ms": TTS_GAP_MS, "loudnorm": TTS_LOUDNORM, "pipeline": TTS_PIPELINE, "endpoint": TTS_ENDPOINT,
+    })
+    master_file = checkpoint.path(final_audio)
+
+    try:
+        with tracer.activate():
+            ok = _run_job(payload, checkpoint, master_file, loudness_file)
+
+        if ok:
+            os.replace(master_file, final_audio)
+            checkpoint.clear()
+        return ok
+
+    finally:
+        try:
+            print(f"🧾 Trace: {tracer.write()}")
+            for name, t in tracer.summary().items():
+                if name != "chunk":
+                    print(f"   {name:<11} {t['wall']:7.1f} sn  cpu {t['child_cpu']:6.1f} sn  {t['bytes']/1024:8.0f} KB")
+        except OSError as e:
+            print(f"⚠️ Trace yazılamadı: {e}")
+
+        if not keep_files:
+            for path in (final_audio, loudness_file):
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def _run_job(payload, checkpoint, final_audio, loudness_file):
+    film_id  = payload["film_id"]
+    callback = payload["callback"]
+
+    print("🎬 Film ID:", film_id)
+
+    entry = checkpoint.lookup("master")
+    if entry is not None:
+        print("⏭️ Mastering checkpoint'ten: sentez ve mastering atlandı")
+        loudness = entry["result"]
+    else:
+        loudness = _synthesize_and_master(payload["text"], final_audio)
+        checkpoint.done("master", loudness, [final_audio])
+
+    with open(loudness_file, "w", encoding="utf-8") as f:
+        json.dump(loudness, f, ensure_ascii=False, indent=2)
+
+    print("🎧 Final mastering ses oluşturuldu:", final_audio)
+    print(f"📊 Loudness: {loudness['achieved']['I']:.1f} LUFS, TP {loudness['achieved']['TP']:.1f} dBTP ({loudness['normalization_type']})")
+
+    print("📤 Sunucuya gönderiliyor...")
+
+    with span("upload") as s:
+        s.add_bytes(os.path.getsize(final_audio))
+        response = upload_file(
+            callback,
+            final_audio,
+            "audio",
+            content_type="audio/mpeg",
+            data={"film_id": film_id, "loudness": json.dumps(loudness)}
+        )
+
+    print("📡 Callback HTTP:", response.status_code)
+    print("✅ İşlem tamamlandı.")
+    return upload_ok(response)
+
+
+def _synthesize_and_master(text, final_audio):
+    with span("split") as s:
+        parts = [normalize_text(p) for p in split_text(text)]
+        s.meta["parts"] = len(parts)
+    print(f"🔊 Parça sayısı: {len(parts)}")
+
+    print(f"⚡ Eşzamanlı TTS: {TTS_CONCURRENCY} işçi ({TTS_ENDPOINT or 'Edge TTS'})")
+    started = time.monotonic()
+    hits, misses = tts_cache.hits, tts_cache.misses
+
+    if TTS_GAP_MS:
+        print(f"🔇 Parçalar arası sessizlik: {TTS_GAP_MS} ms")
+
+    # progressive: mastering sentezle birlikte akar, sentez bitince kısa bir kuyruk kalır
+    progressive = ProgressiveMaster(len(parts), final_audio) if TTS_PIPELINE == "progressive" else None
+    if progressive:
+        print(f"🌊 Progresif mastering başladı (loudnorm: {TTS_LOUDNORM})")
+
+    try:
+        with span("synthesize") as s:
+            chunks = asyncio.run(synthesize_parts(parts, on_chunk=progressive.submit if progressive else None))
+            s.add_bytes(sum(len(c) for c in chunks))
+            s.meta["cache_hits"] = tts_cache.hits - hits
+    except BaseException:
+        if progressive:
+            progressive.abort()
+        raise
+
+    print(f"⏱️ TTS süresi: {time.monotonic() - started:.1f} sn")
+    print(f"♻️ TTS cache: {tts_cache.hits - hits} hit / {tts_cache.misses - misses} miss")
+
+    if progressive:
+        tail = time.monotonic()
+        try:
+            result = progressive.finish()
+            print(f"⏱️ Sentezden sonra mastering: {time.monotonic() - tail:.1f} sn")
+            return loudness_report(result)
+        except ProgressiveError as e:
+            print(f"⚠️ Progresif mastering yapılamadı ({e}), toplu mastering'e geçiliyor")
+
+    print(f"🎚️ Concat + Mastering (EQ + Compressor + Reverb + Normalize, loudnorm: {TTS_LOUDNORM})...")
+    return loudness_report(master_audio(chunks, final_audio))
+
+
+def main():
+    event_path = os.environ.get("GITHUB_EVENT_PATH")
+
+    with open(event_path, "r", encoding="utf-8") as f:
+        event = json.load(f)
+
+    sys.exit(0 if run_job(event["client_payload"]) else 1)
+
+
+if __name__ == "__main__":
+    main()
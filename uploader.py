@@ -0,0 +1,276 @@
+"""
+uploader.py - Callback'e dosya yükleme (tts.py ve fragman.py ortak)
+- Multipart gövde dosyadan parça parça okunur, dosya belleğe alınmaz
+- Bağlantı hatası / 5xx / 429'da exponential backoff ile tekrar dener
+- UPLOAD_RESUMABLE=1 ise Content-Range ile parçalı, devam ettirilebilir yükleme:
+    POST callback  (X-Upload-Id, Content-Range: bytes a-b/toplam)  → 308 + Range: bytes=0-b
+    POST callback  (Content-Range: bytes */toplam, boş gövde)      → sunucudaki ilerlemeyi sorar
+    son parça                                                      → 2xx + X-Upload-Complete: 1
+  Tamamlanma sadece X-Upload-Complete ile kabul edilir; bunu göndermeden 2xx dönen
+  (Content-Range'i tanımayan) callback'e dosya multipart olarak yeniden yüklenir
+- Başarı kuralı tek yerde: upload_ok(response) → 2xx
+- Aktarım hızını (MB/s) raporlar
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import requests
+
+from retry import backoff
+
+UPLOAD_RETRIES   = max(1, int(os.environ.get("UPLOAD_RETRIES", "5")))
+UPLOAD_TIMEOUT   = int(os.environ.get("UPLOAD_TIMEOUT", "300"))
+UPLOAD_RESUMABLE = os.environ.get("UPLOAD_RESUMABLE", "") == "1"
+UPLOAD_CHUNK_MB  = max(1, int(os.environ.get("UPLOAD_CHUNK_MB", "8")))
+
+BLOCK_SIZE = 256 * 1024
+RETRY_STATUS = {429, 500, 502, 503, 504}
+COMPLETE_HEADER = "X-Upload-Complete"
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def shared_session():
+    # Worker modunda işler arası bağlantı havuzu sıcak kalsın
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        return _session
+
+
+# ============================================
+# AKAN GÖVDE
+# ============================================
+
+class StreamBody:
+    """
+    bytes ve (path, offset, length) parçalarından oluşan, okundukça diskten
+    okuyan gövde. __len__ sayesinde requests Content-Length gönderir.
+    """
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.length = sum(len(s) if isinstance(s, bytes) else s[2] for s in segments)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for segment in self.segments:
+            if isinstance(segment, bytes):
+                if segment:
+                    yield segment
+                continue
+
+            path, offset, length = segment
+            with open(path, "rb") as f:
+                f.seek(offset)
+                while length > 0:
+                    block = f.read(min(BLOCK_SIZE, length))
+                    if not block:
+                        raise IOError(f"Dosya beklenenden kısa: {path}")
+                    length -= len(block)
+                    yield block
+
+
+def multipart_body(path, field, filename, content_type, data):
+    boundary = uuid.uuid4().hex
+    head = b""
+
+    for name, value in (data or {}).items():
+        head += (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n"
+        ).encode("utf-8")
+
+    head += (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8")
+
+    tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+    body = StreamBody([head, (path, 0, os.path.getsize(path)), tail])
+
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+# ============================================
+# TEK SEFERDE (MULTIPART) YÜKLEME
+# ============================================
+
+def _upload_multipart(session, url, path, field, filename, content_type, data, retries, timeout, log):
+    response = None
+
+    for attempt in range(1, retries + 1):
+        body, body_type = multipart_body(path, field, filename, content_type, data)
+
+        try:
+            started = time.monotonic()
+            response = session.post(url, data=body, headers={"Content-Type": body_type}, timeout=timeout)
+            _log_speed(log, len(body), time.monotonic() - started)
+
+            if response.status_code not in RETRY_STATUS:
+                return response
+
+            log(f"⚠️ Upload HTTP {response.status_code} (deneme {attempt}/{retries})")
+
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries:
+                raise
+            log(f"⚠️ Upload bağlantı hatası (deneme {attempt}/{retries}): {str(e)[:150]}")
+
+        if attempt < retries:
+            time.sleep(backoff(attempt))
+
+    return response
+
+
+# ============================================
+# PARÇALI / DEVAM ETTİRİLEBİLİR YÜKLEME
+# ============================================
+
+class _NotResumable(Exception):
+    # Callback Content-Range protokolünü tanımıyor; multipart'a düşülür
+    pass
+
+
+def _completed(response):
+    # Parçalı yüklemede tek geçerli tamamlanma sinyali
+    return upload_ok(response) and response.headers.get(COMPLETE_HEADER) == "1"
+
+
+def _committed(response, default):
+    # "Range: bytes=0-N" → N+1 byte sunucuda
+    value = response.headers.get("Range", "")
+    if value.startswith("bytes=") and "-" in value:
+        return int(value.split("-")[-1]) + 1
+    return default
+
+
+def upload_id_for(url, path):
+    # Aynı dosya + hedef için sabit; süreç yeniden başlasa da kaldığı yerden devam eder
+    st = os.stat(path)
+    raw = f"{url}|{os.path.abspath(path)}|{st.st_size}|{int(st.st_mtime)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _upload_resumable(session, url, path, field, filename, content_type, data, retries, timeout, chunk_size, log):
+    size = os.path.getsize(path)
+    headers = {
+        "X-Upload-Id": upload_id_for(url, path),
+        "X-Upload-Field": field,
+        "X-Upload-Filename": filename,
+        "X-Upload-Meta": json.dumps(data or {}, ensure_ascii=True),
+        "Content-Type": content_type,
+    }
+
+    def query_offset(default):
+        # Sunucuda kaç byte var? Sadece açık tamamlanma sinyalinde cevabı da döner
+        try:
+            response = session.post(url, data=b"", timeout=timeout,
+                                    headers={**headers, "Content-Range": f"bytes */{size}"})
+        except (requests.ConnectionError, requests.Timeout):
+            return default, None
+
+        if _completed(response):
+            return default, response
+        if response.status_code == 308:
+            # Hepsi alınmış ama tamamlanmamışsa son byte tekrar gönderilir, tamamlanma cevabı gelsin
+            return min(_committed(response, 0), size - 1), None
+        return default, None
+
+    offset, done = query_offset(0)
+    if done is not None:
+        log(f"♻️ Upload sorgusu HTTP {done.status_code}, tekrar gönderilmiyor")
+        return done
+    if offset:
+        log(f"♻️ Upload {offset/1024/1024:.1f} MB'tan devam ediyor")
+
+    started = time.monotonic()
+    start_offset = offset
+    attempt = 0
+    response = None
+
+    while True:
+        end = min(offset + chunk_size, size) - 1
+        body = StreamBody([(path, offset, end - offset + 1)])
+
+        try:
+            response = session.post(url, data=body, timeout=timeout,
+                                    headers={**headers, "Content-Range": f"bytes {offset}-{end}/{size}"})
+
+            if response.status_code == 308:
+                offset = _committed(response, end + 1)
+                attempt = 0
+                log(f"📊 Upload: {offset/1024/1024:.1f}/{size/1024/1024:.1f} MB")
+                continue
+
+            if _completed(response) or (response.status_code not in RETRY_STATUS and not upload_ok(response)):
+                _log_speed(log, size - start_offset, time.monotonic() - started)
+                return response
+
+            if upload_ok(response):
+                # 2xx ama tamamlanma sinyali yok: sunucu parçayı sıradan POST sandı
+                raise _NotResumable(f"HTTP {response.status_code}, {COMPLETE_HEADER} yok")
+
+            log(f"⚠️ Upload parça HTTP {response.status_code}")
+
+        except (requests.ConnectionError, requests.Timeout) as e:
+            log(f"⚠️ Upload parça bağlantı hatası: {str(e)[:150]}")
+
+        attempt += 1
+        if attempt >= retries:
+            if response is not None:
+                return response
+            raise requests.ConnectionError(f"Upload {retries} denemede tamamlanamadı")
+
+        time.sleep(backoff(attempt))
+
+        # Sunucu parçanın ne kadarını aldı?
+        offset, done = query_offset(offset)
+        if done is not None:
+            return done
+
+
+# ============================================
+# ORTAK GİRİŞ
+# ============================================
+
+def upload_ok(response):
+    # tts ve fragman için ortak başarı kuralı
+    return response is not None and 200 <= response.status_code < 300
+
+
+def _log_speed(log, nbytes, elapsed):
+    speed = nbytes / 1024 / 1024 / max(elapsed, 1e-6)
+    log(f"📶 Upload: {nbytes/1024/1024:.1f} MB, {elapsed:.1f} sn, {speed:.2f} MB/s")
+
+
+def upload_file(url, path, field, filename=None, content_type="application/octet-stream", data=None,
+                retries=UPLOAD_RETRIES, timeout=UPLOAD_TIMEOUT, resumable=UPLOAD_RESUMABLE,
+                chunk_mb=UPLOAD_CHUNK_MB, session=None, log=print):
+    """
+    Dosyayı callback'e yükler, son requests.Response'u döner.
+    Tüm denemeler bağlantı hatasıyla biterse requests.ConnectionError fırlatır.
+    """
+    filename = filename or os.path.basename(path)
+    session = session or shared_session()
+
+    if resumable:
+        try:
+            return _upload_resumable(session, url, path, field, filename, content_type, data,
+                                     retries, timeout, chunk_mb * 1024 * 1024, log)
+        except _NotResumable as e:
+            log(f"⚠️ Callback parçalı yüklemeyi desteklemiyor ({e}), multipart gönderiliyor")
+
+    return _upload_multipart(session, url, path, field, filename, content_type, data, retries, timeout, log)
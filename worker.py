@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+worker.py - Uzun süre çalışan iş kuyruğu işçisi (tts.py / fragman.py)
+- Kuyruk: SQLite (.cache/queue.sqlite), payload = repository_dispatch client_payload
+- Her iş kendi modülünün run_job(payload) fonksiyonuyla işlenir; modül bir kez import
+  edilir, HTTP oturumları / cache'ler / key sağlığı işler arasında sıcak kalır
+- Çalışan işin lease'i periyodik yenilenir; süreci ölen işler lease süresi dolunca
+  tekrar kuyruğa döner
+- Başarısız iş WORKER_MAX_ATTEMPTS denemeye kadar tekrar kuyruğa girer
+- batch: JSONL'deki tüm işleri tek komutla işler, sonuçları manifest JSONL'e yazar.
+  İşler türe göre karıştırılır ve CPU yuvasından (slots.py) fazla iş aynı anda
+  koşar: bir işin ffmpeg'i çalışırken diğerleri TTS / indirme / upload yapar
+
+Kullanım:
+    python worker.py enqueue fragman event.json        # client_payload veya tüm event JSON
+    python worker.py enqueue tts - < payload.json
+    python worker.py run --kinds tts,fragman --concurrency 2
+    python worker.py run --drain                       # kuyruk boşalınca çık
+    python worker.py status
+    python worker.py batch films.jsonl --manifest results.jsonl --skip-done
+"""
+
+import argparse
+import json
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import zip_longest
+
+import slots
+from retry import backoff
+
+QUEUE_FILE          = os.environ.get("WORKER_QUEUE", os.path.join(".cache", "queue.sqlite"))
+WORKER_CONCURRENCY  = max(1, int(os.environ.get("WORKER_CONCURRENCY", "1")))
+WORKER_MAX_ATTEMPTS = max(1, int(os.environ.get("WORKER_MAX_ATTEMPTS", "2")))
+WORKER_LEASE        = int(os.environ.get("WORKER_LEASE", "1800"))   # sn; iş sürerken her lease/3'te yenilenir
+WORKER_POLL         = float(os.environ.get("WORKER_POLL", "2"))
+
+
+# ============================================
+# İŞ TÜRLERİ
+# ============================================
+
+def run_tts(payload):
+    import tts
+    return tts.run_job(payload, keep_files=False)
+
+
+def run_fragman(payload):
+    import fragman
+    return fragman.run_job(payload)
+
+
+HANDLERS = {
+    "tts": run_tts,
+    "fragman": run_fragman,
+}
+
+
+# ============================================
+# KUYRUK
+# ============================================
+
+class JobQueue:
+    """
+    jobs tablosu: queued → running → done | failed.
+    claim() BEGIN IMMEDIATE ile atomik; aynı kuyruğu birden fazla süreç paylaşabilir.
+    """
+
+    def __init__(self, path=QUEUE_FILE):
+        self.path = path
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind        TEXT NOT NULL,
+                    payload     TEXT NOT NULL,
+                    status      TEXT NOT NULL DEFAULT 'queued',
+                    attempts    INTEGER NOT NULL DEFAULT 0,
+                    error       TEXT,
+                    created     REAL NOT NULL,
+                    started     REAL,
+                    finished    REAL,
+                    lease_until REAL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, kind, id)")
+
+    @contextmanager
+    def _connect(self):
+        # Transaction'ları elle yönetiriz (BEGIN IMMEDIATE / COMMIT)
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def enqueue(self, kind, payload):
+        if kind not in HANDLERS:
+            raise ValueError(f"Bilinmeyen iş türü: {kind}")
+
+        with self._connect() as db:
+            cursor = db.execute("INSERT INTO jobs (kind, payload, created) VALUES (?, ?, ?)",
+                                (kind, json.dumps(payload, ensure_ascii=False), time.time()))
+            return cursor.lastrowid
+
+    def claim(self, kinds, lease=WORKER_LEASE):
+        # Sıradaki işi (veya lease'i dolmuş takılı işi) alır; yoksa None
+        now = time.time()
+        marks = ",".join("?" * len(kinds))
+
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(f"""
+                    SELECT * FROM jobs
+                    WHERE kind IN ({marks})
+                      AND (status = 'queued' OR (status = 'running' AND lease_until < ?))
+                    ORDER BY id LIMIT 1
+                """, (*kinds, now)).fetchone()
+
+                if row is None:
+                    db.execute("COMMIT")
+                    return None
+
+                db.execute("""
+                    UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                                    started = ?, lease_until = ?
+                    WHERE id = ?
+                """, (now, now + lease, row["id"]))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+        job = dict(row)
+        job["attempts"] += 1
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def renew(self, job, lease=WORKER_LEASE):
+        # İş hâlâ bu işçideyse (lease dolup başkası almadıysa) lease'i uzatır
+        with self._connect() as db:
+            cursor = db.execute("""
+                UPDATE jobs SET lease_until = ?
+                WHERE id = ? AND status = 'running' AND attempts = ?
+            """, (time.time() + lease, job["id"], job["attempts"]))
+            return cursor.rowcount == 1
+
+    def finish(self, job, ok, error=None, max_attempts=WORKER_MAX_ATTEMPTS):
+        if ok:
+            status = "done"
+        elif job["attempts"] < max_attempts:
+            status = "queued"
+        else:
+            status = "failed"
+
+        # Lease dolup iş başka işçiye geçtiyse (attempts arttı) sonucu o işçi yazar
+        with self._connect() as db:
+            cursor = db.execute("""
+                UPDATE jobs SET status = ?, error = ?, finished = ?, lease_until = NULL
+                WHERE id = ? AND status = 'running' AND attempts = ?
+            """, (status, error, time.time(), job["id"], job["attempts"]))
+
+        if cursor.rowcount != 1:
+            print(f"⚠️ İş #{job['id']} (deneme {job['attempts']}) sonucu yazılmadı: lease başka işçide")
+            return "lost"
+        return status
+
+    def counts(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status").fetchall()
+
+        counts = {}
+        for row in rows:
+            counts.setdefault(row["kind"], {})[row["status"]] = row["n"]
+        return counts
+
+
+# ============================================
+# İŞÇİ
+# ============================================
+
+def heartbeat(queue, job, done, lease=WORKER_LEASE):
+    # İş sürdükçe lease yenilenir: WORKER_LEASE'ten uzun işler başka işçiye geçmez
+    while not done.wait(lease / 3):
+        try:
+            if not queue.renew(job, lease):
+                print(f"⚠️ İş #{job['id']} lease'i kaybedildi (başka işçi almış olabilir)")
+                return
+        except sqlite3.Error as e:
+            print(f"⚠️ İş #{job['id']} lease yenilenemedi: {e}")
+
+
+def process(queue, job, lease=WORKER_LEASE):
+    name = f"#{job['id']} ({job['kind']}, deneme {job['attempts']})"
+    print(f"▶️ İş başladı {name}")
+    started = time.monotonic()
+
+    done = threading.Event()
+    renewer = threading.Thread(target=heartbeat, args=(queue, job, done, lease), daemon=True)
+    renewer.start()
+
+    try:
+        ok = bool(HANDLERS[job["kind"]](job["payload"]))
+        error = None if ok else "run_job False döndü"
+    except Exception as e:
+        ok = False
+        error = f"{type(e).__name__}: {str(e)[:500]}"
+    finally:
+        done.set()
+        renewer.join()
+
+    status = queue.finish(job, ok, error)
+    icon = "⚠️" if status == "lost" else "✅" if ok else ("🔁" if status == "queued" else "❌")
+    print(f"{icon} İş {name} → {status} ({time.monotonic() - started:.1f} sn)" + (f" | {error}" if error else ""))
+    return status
+
+
+def run(queue, kinds, concurrency=WORKER_CONCURRENCY, drain=False, stop=None):
+    stop = stop or threading.Event()
+    stats = {"done": 0, "queued": 0, "failed": 0, "lost": 0}
+    active = [0]
+    lock = threading.Lock()
+
+    def loop():
+        while not stop.is_set():
+            with lock:
+                job = queue.claim(kinds)
+                if job is not None:
+                    active[0] += 1
+                busy = active[0]
+
+            if job is None:
+                # drain: başka thread'in işi tekrar kuyruğa dönebilir, hepsi bitene kadar bekle
+                if drain and not busy:
+                    return
+                stop.wait(WORKER_POLL)
+                continue
+
+            status = process(queue, job)
+            with lock:
+                active[0] -= 1
+                stats[status] += 1
+
+    print(f"👷 Worker: {', '.join(kinds)} | eşzamanlı {concurrency} | kuyruk {queue.path}")
+    threads = [threading.Thread(target=loop, name=f"worker-{i}", daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    # join(timeout) ile ana thread sinyalleri işleyebilir
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(timeout=0.5)
+
+    print(f"🏁 Worker bitti: {stats['done']} başarılı, {stats['failed']} başarısız, {stats['queued']} tekrar denendi"
+          + (f", {stats['lost']} lease kaybı" if stats["lost"] else ""))
+    return stats
+
+
+# ============================================
+# BATCH (JSONL)
+# ============================================
+
+def infer_kind(payload):
+    if "text" in payload:
+        return "tts"
+    if "tmdb_id" in payload:
+        return "fragman"
+    return None
+
+
+def read_jobs(path):
+    """
+    Her satır: {"kind": "tts", "payload": {...}} veya {"kind": ..., "client_payload": {...}}
+    ya da doğrudan client_payload (tür alanlardan çıkarılır: text → tts, tmdb_id → fragman).
+    """
+    jobs = []
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+
+            entry = json.loads(line)
+            payload = entry.get("payload") or entry.get("client_payload") or \
+                {k: v for k, v in entry.items() if k != "kind"}
+            kind = entry.get("kind") or infer_kind(payload)
+
+            if kind not in HANDLERS:
+                raise ValueError(f"{path}:{line_no} iş türü belirlenemedi")
+
+            jobs.append({"line": line_no, "kind": kind, "payload": payload})
+
+    return jobs
+
+
+def interleave(jobs):
+    # tts (ağ + mastering) ile fragman (ağ + render) sırayla gelsin ki yükler karışsın
+    by_kind = {}
+    for job in jobs:
+        by_kind.setdefault(job["kind"], []).append(job)
+    return [job for group in zip_longest(*by_kind.values()) for job in group if job]
+
+
+def finished_jobs(manifest):
+    # Önceki çalıştırmada başarılı olan (tür, film_id) çiftleri
+    done = set()
+    try:
+        with open(manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    if row.get("ok"):
+                        done.add((row["kind"], str(row["film_id"])))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def run_batch(jobs, manifest, concurrency, stop=None, skip_done=False, max_attempts=WORKER_MAX_ATTEMPTS):
+    stop = stop or threading.Event()
+    done = finished_jobs(manifest) if skip_done else set()
+    stats = {"ok": 0, "failed": 0, "skipped": 0}
+    lock = threading.Lock()
+
+    def record(row):
+        with lock:
+            stats["ok" if row["ok"] else ("skipped" if row.get("skipped") else "failed")] += 1
+            with open(manifest, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def run_one(job):
+        film_id = job["payload"].get("film_id")
+
+        if (job["kind"], str(film_id)) in done:
+            with lock:
+                stats["skipped"] += 1
+            return
+
+        if stop.is_set():
+            record({"line": job["line"], "kind": job["kind"], "film_id": film_id,
+                    "ok": False, "skipped": True, "error": "durduruldu"})
+            return
+
+        started = time.monotonic()
+        started_at = datetime.now().isoformat(timespec="seconds")
+        ok, error, attempt = False, None, 0
+
+        while attempt < max_attempts and not ok and not stop.is_set():
+            attempt += 1
+            print(f"▶️ Satır {job['line']} ({job['kind']}, film {film_id}, deneme {attempt})")
+            try:
+                ok = bool(HANDLERS[job["kind"]](job["payload"]))
+                error = None if ok else "run_job False döndü"
+            except Exception as e:
+                error = f"{type(e).__name__}: {str(e)[:500]}"
+
+            if not ok and attempt < max_attempts:
+                stop.wait(backoff(attempt))
+
+        seconds = round(time.monotonic() - started, 2)
+        print(f"{'✅' if ok else '❌'} Satır {job['line']} ({job['kind']}, film {film_id}) {seconds} sn"
+              + (f" | {error}" if error else ""))
+
+        record({"line": job["line"], "kind": job["kind"], "film_id": film_id, "ok": ok,
+                "attempts": attempt, "error": error, "started": started_at, "seconds": seconds})
+
+    ordered = interleave(jobs)
+    print(f"📦 Batch: {len(ordered)} iş | eşzamanlı {concurrency} | ffmpeg yuvası {slots.FFMPEG_SLOTS} | manifest {manifest}")
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_one, job) for job in ordered]
+
+        # Ana thread sinyalleri işleyebilsin
+        while not all(future.done() for future in futures):
+            time.sleep(0.5)
+
+    print(f"🏁 Batch bitti ({time.monotonic() - started:.1f} sn): {stats['ok']} başarılı, "
+          f"{stats['failed']} başarısız, {stats['skipped']} atlandı | ffmpeg yuvası bekleme {slots.waited():.1f} sn")
+    return stats
+
+
+# ============================================
+# MAIN
+# ============================================
+
+def install_stop():
+    # SIGTERM / Ctrl+C: yeni iş alınmaz, çalışan işler bitirilir
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: (print("🛑 Durduruluyor, çalışan işler bitiriliyor..."), stop.set()))
+    return stop
+
+
+def load_payload(source):
+    if source == "-":
+        data = json.load(sys.stdin)
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+    # GitHub event dosyası da doğrudan verilebilir
+    return data.get("client_payload", data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tts / fragman iş kuyruğu")
+    parser.add_argument("--queue", default=QUEUE_FILE, help="SQLite kuyruk dosyası")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = sub.add_parser("enqueue", help="kuyruğa iş ekle")
+    enqueue.add_argument("kind", choices=sorted(HANDLERS))
+    enqueue.add_argument("payload", help="client_payload JSON dosyası (veya - ile stdin)")
+
+    worker = sub.add_parser("run", help="kuyruktaki işleri işle")
+    worker.add_argument("--kinds", default=",".join(sorted(HANDLERS)))
+    worker.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    worker.add_argument("--drain", action="store_true", help="kuyruk boşalınca çık")
+
+    sub.add_parser("status", help="iş sayıları")
+
+    batch = sub.add_parser("batch", help="JSONL dosyasındaki işleri kuyruksuz işle")
+    batch.add_argument("jobs", help="her satırı bir iş olan JSONL")
+    batch.add_argument("--manifest", help="sonuç JSONL (varsayılan: <jobs>.results.jsonl)")
+    batch.add_argument("--concurrency", type=int, default=2 * slots.FFMPEG_SLOTS)
+    batch.add_argument("--skip-done", action="store_true", help="manifest'te başarılı olanları atla")
+
+    args = parser.parse_args()
+
+    if args.command == "batch":
+        jobs = read_jobs(args.jobs)
+        manifest = args.manifest or f"{os.path.splitext(args.jobs)[0]}.results.jsonl"
+        stats = run_batch(jobs, manifest, max(1, args.concurrency), install_stop(), args.skip_done)
+        return 0 if not stats["failed"] else 1
+
+    queue = JobQueue(args.queue)
+
+    if args.command == "enqueue":
+        job_id = queue.enqueue(args.kind, load_payload(args.payload))
+        print(f"📥 Kuyruğa eklendi: #{job_id} ({args.kind})")
+        return 0
+
+    if args.command == "status":
+        print(json.dumps(queue.counts(), indent=2))
+        return 0
+
+    kinds = [kind for kind in args.kinds.split(",") if kind]
+    unknown = set(kinds) - set(HANDLERS)
+    if unknown:
+        parser.error(f"bilinmeyen iş türü: {', '.join(sorted(unknown))}")
+
+    stats = run(queue, kinds, max(1, args.concurrency), args.drain, install_stop())
+    return 0 if not stats["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())